@@ -0,0 +1,117 @@
+"""
+Concurrency limits and load shedding.
+
+- Every request takes an in-flight slot. Once MAX_INFLIGHT_REQUESTS are being
+  handled, new requests are shed with a 503 and Retry-After instead of piling
+  up threads on the Pi. The last PRIORITY_RESERVE slots are kept for the cheap,
+  interactive endpoints (play counts, now playing, last played), so a burst
+  of page loads or lyrics lookups can't lock out the "I SPUN IT" button.
+- Expensive work inside a request (a cold Genius search + scrape) is gated by
+  a ConcurrencyLimit: at most `limit` run at once, up to `queue_size` more wait
+  briefly for a slot, and anything beyond that is shed immediately.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import SHED_REQUESTS
+from resilience import remaining_budget
+
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", 32))
+PRIORITY_RESERVE = int(os.getenv("PRIORITY_RESERVE", 8))
+LYRICS_CONCURRENCY = int(os.getenv("LYRICS_CONCURRENCY", 2))
+LYRICS_QUEUE = int(os.getenv("LYRICS_QUEUE", 4))
+# Longest a queued request waits for a slot (also capped by its request budget)
+QUEUE_WAIT_SECONDS = float(os.getenv("QUEUE_WAIT_SECONDS", 5))
+# What shed clients are told to wait before retrying
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", 2))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because a concurrency limit is full"""
+
+    def __init__(self, name: str, retry_after: int = SHED_RETRY_AFTER):
+        super().__init__(f"{name} is at capacity")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class InflightLimit:
+    """Non-blocking cap on concurrent requests with a reserve for priority requests"""
+
+    def __init__(self, limit: int = MAX_INFLIGHT_REQUESTS, reserve: int = PRIORITY_RESERVE):
+        self.limit = limit
+        self.reserve = min(reserve, max(0, limit - 1))
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self, priority: bool):
+        with self._lock:
+            ceiling = self.limit if priority else self.limit - self.reserve
+            if self.active >= ceiling:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.active -= 1
+
+
+class ConcurrencyLimit:
+    """At most `limit` holders at once, with a short bounded queue of waiters"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, wait_seconds: float = QUEUE_WAIT_SECONDS):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.wait_seconds = wait_seconds
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises Overloaded when shed"""
+        wait = self.wait_seconds
+        budget = remaining_budget()
+        if budget is not None:
+            wait = min(wait, budget)
+
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size or wait <= 0:
+                SHED_REQUESTS.inc(limit=self.name, reason="queue_full")
+                raise Overloaded(self.name)
+
+            self.waiting += 1
+            deadline = time.monotonic() + wait
+            try:
+                while self.active >= self.limit:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        SHED_REQUESTS.inc(limit=self.name, reason="queue_timeout")
+                        raise Overloaded(self.name)
+                    self._cond.wait(left)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+INFLIGHT = InflightLimit()
+LYRICS_FETCHES = ConcurrencyLimit("lyrics_fetch", LYRICS_CONCURRENCY, LYRICS_QUEUE)
@@ -1,5 +1,8 @@
+import logging
 import os
-from flask import Flask, render_template, request, jsonify
+import threading
+import time
+from flask import Flask, Response, abort, g, make_response, render_template, request, jsonify, send_from_directory
 from dotenv import load_dotenv
 from discogs_api import (
     get_collection,
@@ -9,102 +12,351 @@ from discogs_api import (
     get_current_record,
     clear_now_playing,
     get_last_played,
+    get_cached_collection,
+    get_collection_genres,
+    get_genre_release_ids,
+    get_listening_stats,
 )  # Import from your new file
 from lyrics_api import get_lyrics  # Import lyrics function
+from collection_view import build_collection_view, make_view
+from snapshot import load_snapshot, save_snapshot, snapshot_path
+from admission import INFLIGHT, Overloaded
+from resilience import DISCOGS_BREAKER, GENIUS_BREAKER, UpstreamUnavailable, with_request_budget
+from metrics import HTTP_REQUEST_DURATION, SHED_REQUESTS, SYNC_DURATION, render_metrics
+from logging_setup import configure_logging
+from release_refresh import start_release_refresh
+from users import load_users
+from static_assets import init_assets
+from profiling import PROFILE_DIR, Profile, is_admin, list_profiles, profile_sync, should_profile_request
 
 # Load environment variables from .env file
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+init_assets(app)
 
-DISCOGS_USERNAME = os.getenv("DISCOGS_USERNAME")
-DISCOGS_TOKEN = os.getenv("DISCOGS_TOKEN")
+# Household members whose collections are served ({username: token}); the first is the default
+USERS = load_users()
 
 # Validate that credentials are set
-if not DISCOGS_USERNAME or not DISCOGS_TOKEN:
-    raise ValueError("DISCOGS_USERNAME and DISCOGS_TOKEN must be set in .env file")
+if not USERS:
+    raise ValueError("DISCOGS_USERS (or DISCOGS_USERNAME and DISCOGS_TOKEN) must be set in .env file")
+DEFAULT_USER = next(iter(USERS))
+
+# How long a synced collection is served before a background re-sync is started
+COLLECTION_REFRESH_SECONDS = int(os.getenv("COLLECTION_REFRESH_SECONDS", 300))
+
+# How long the page remembers which collection was picked
+USER_COOKIE_MAX_AGE = 365 * 86400
+
+
+class UserCollection:
+    """One user's credentials and the in-memory view model served for their collection"""
+
+    def __init__(self, username: str, token: str):
+        self.username = username
+        self.token = token
+        self.snapshot_path = snapshot_path(username)
+        self.view = None  # swapped atomically after each sync
+        self.fallback_view = None  # cached releases, served until the first sync succeeds
+        self.last_refresh = 0.0
+        self.last_refresh_failed = False
+        self.refresh_running = threading.Event()
+
+
+_collection_lock = threading.Lock()
+_collections = {username: UserCollection(username, token) for username, token in USERS.items()}
+
+# Serve the last persisted snapshots immediately on startup, then refresh in the background
+for _user in _collections.values():
+    _snapshot = load_snapshot(_user.snapshot_path)
+    if _snapshot is not None:
+        _user.view = make_view(_snapshot["collection"], _snapshot["genres"], _snapshot["created_at"],
+                               get_all_play_counts(_user.username))
+        logger.info("Loaded %s's collection snapshot with %d records", _user.username, len(_snapshot["collection"]))
+
+
+def current_user():
+    """
+    The collection a request is for: ?user=, a "user" field in a JSON body, the
+    cookie set when the page was last opened with ?user=, or the default user.
+    """
+    username = request.args.get("user")
+    if username is None and request.is_json:
+        username = (request.get_json(silent=True) or {}).get("user")
+    if username is not None:
+        if username not in _collections:
+            abort(404, description=f"Unknown user {username!r}")
+        return _collections[username]
+    return _collections.get(request.cookies.get("user"), _collections[DEFAULT_USER])
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+# Cheap, interactive endpoints that may use the in-flight slots reserved for them
+PRIORITY_ENDPOINTS = {"update_play_count_api", "clear_now_playing_api", "last_played_api", "metrics_api"}
+
+
+@app.before_request
+def _admit_request():
+    priority = request.endpoint in PRIORITY_ENDPOINTS
+    if not INFLIGHT.try_enter(priority):
+        SHED_REQUESTS.inc(limit="inflight", reason="priority" if priority else "reserved")
+        raise Overloaded("server")
+    g.admitted = True
+
+
+@app.teardown_request
+def _release_request(exc):
+    if g.pop("admitted", False):
+        INFLIGHT.leave()
+
+
+@app.errorhandler(Overloaded)
+def _shed_request(e):
+    """Too busy right now - tell the client to retry shortly rather than queue"""
+    response = jsonify({"error": "Server busy, try again shortly"})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 503
+
+
+@app.before_request
+def _start_request_profile():
+    if should_profile_request(request):
+        g.profile = Profile("request", f"{request.method} {request.path}")
+
+
+@app.after_request
+def _save_request_profile(response):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        response.headers["X-Profile"] = profile.stop()
+    return response
+
+
+@app.after_request
+def _record_request_duration(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, route=route, method=request.method, status=response.status_code)
+    return response
+
+
+def refresh_collection(user: UserCollection):
+    """
+    Sync a user's collection from Discogs, rebuild the view model and persist it.
+
+    This is the only place that talks to Discogs for the collection list; the
+    page itself is always served from the in-memory view.
+    """
+    with profile_sync():
+        start = time.perf_counter()
+        try:
+            releases = get_collection(user.username, user.token)
+        except Exception:
+            SYNC_DURATION.observe(time.perf_counter() - start, result="error")
+            raise
+        SYNC_DURATION.observe(time.perf_counter() - start, result="ok")
+
+        collection, genres = build_collection_view(releases)
+    view = make_view(collection, genres, int(time.time()), get_all_play_counts(user.username))
+
+    try:
+        save_snapshot(collection, genres, user.snapshot_path)
+    except OSError as e:
+        logger.warning("Could not write collection snapshot: %s", e)
+
+    with _collection_lock:
+        user.view = view
+        user.fallback_view = None
+        user.last_refresh = time.time()
+        user.last_refresh_failed = False
+    return view
+
+
+def _background_refresh(user: UserCollection):
+    try:
+        refresh_collection(user)
+    except Exception as e:
+        logger.warning("Background collection refresh for %s failed: %s", user.username, e)
+        user.last_refresh_failed = True
+    finally:
+        user.refresh_running.clear()
+
+
+def start_background_refresh(user: UserCollection):
+    """
+    Kick off a sync of a user's collection in a background thread (at most one
+    per user at a time; different users sync in parallel, sharing the Discogs
+    rate limit and release cache)
+    """
+    with _collection_lock:
+        if user.refresh_running.is_set():
+            return
+        user.refresh_running.set()
+        # Count the attempt so a failing Discogs isn't retried on every request
+        user.last_refresh = time.time()
+    _start_refresh_thread(user)
+
+
+def _start_refresh_thread(user: UserCollection):
+    """Run a sync the caller has already marked as running"""
+    threading.Thread(target=_background_refresh, args=(user,), name=f"collection-refresh-{user.username}", daemon=True).start()
+
+
+def get_fallback_view(user: UserCollection):
+    """The user's cached releases as a view, built once and reused until a sync succeeds"""
+    with _collection_lock:
+        view = user.fallback_view
+    if view is None:
+        collection, genres = build_collection_view(get_cached_collection(user.username))
+        view = make_view(collection, genres, None, get_all_play_counts(user.username))
+        with _collection_lock:
+            user.fallback_view = view
+    return view
+
+
+def get_collection_view(user: UserCollection):
+    """
+    Return the user's current view model, syncing in the foreground only if
+    there is nothing to serve yet (first run, no snapshot) and no sync is
+    already running.
+    """
+    with _collection_lock:
+        view = user.view
+        stale = time.time() - user.last_refresh >= COLLECTION_REFRESH_SECONDS
+        # Only one request syncs in the foreground; the others serve the fallback meanwhile
+        foreground = view is None and not user.refresh_running.is_set()
+        if foreground:
+            user.refresh_running.set()
+            user.last_refresh = time.time()
+
+    if view is None:
+        if not foreground:
+            # Don't pile foreground syncs on top of the one in progress
+            return get_fallback_view(user)
+        try:
+            view = refresh_collection(user)
+        except Exception as e:
+            # Discogs is down (or too slow for this request) - serve whatever
+            # releases are cached and keep syncing in the background (still
+            # marked as running, so no other request starts a sync meanwhile)
+            logger.warning("Collection sync failed, serving cached releases: %s", e)
+            user.last_refresh_failed = True
+            _start_refresh_thread(user)
+            return get_fallback_view(user)
+        user.refresh_running.clear()
+        return view
+    if stale:
+        start_background_refresh(user)
+    return view
+
+
+def get_stale_since(user: UserCollection, view):
+    """
+    Describe how old the served collection is when Discogs can't be reached,
+    or return None otherwise - including while a first sync is still running.
+    """
+    if not (DISCOGS_BREAKER.is_open or user.last_refresh_failed):
+        return None
+    if view["created_at"] is None:
+        return "your last sync"
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(view["created_at"]))
+
+
+def record_dict(release, orders, current_record_id):
+    """A Release plus the per-request fields, as sent to the page"""
+    return {
+        **release.to_dict(),
+        "sort_artist": orders.artist_keys[release.id],
+        "play_count": orders.play_counts.get(release.id, 0),
+        "is_current": bool(current_record_id and release.id == current_record_id),
+    }
+
+
+def select_records(user, view, sort_by, genre, search_query):
+    """The view's records in `sort_by` order, filtered by genre and search text"""
+    records = view["orders"].ordered(sort_by)
+
+    # Genre filter comes from an indexed query on the release tables
+    if genre:
+        genre_ids = get_genre_release_ids(user.username, genre)
+        records = [r for r in records if r.id in genre_ids]
+
+    # Filter by search
+    if search_query:
+        records = [r for r in records if search_query in r.title.lower() or search_query in r.artist.lower()]
+
+    return records
+
 
 @app.route("/", methods=["GET"])
+@with_request_budget
 def index():
     sort_by = request.args.get("sort", "artist")
     search_query = request.args.get("search", "").lower()
+    genre = request.args.get("genre", "")
+    user = current_user()
 
-    # Use the new cached version
-    releases = get_collection(DISCOGS_USERNAME, DISCOGS_TOKEN)
-    
-    # Get all play counts
-    play_counts = get_all_play_counts()
+    # Served from memory (snapshot or last sync) - Discogs is synced in the background
+    view = get_collection_view(user)
+    orders = view["orders"]
 
     # Get the record that is currently spinning
-    current_record_id = get_current_record()
-    
-    # Transform to your existing format
-    collection = []
-    all_genres = set()  # Collect all unique genres
-    
-    for r in releases:
-        basic = r.get("basic_information", {})
-        release_id = basic.get("id")
-        genres = basic.get("genres", []) or []
-        styles = basic.get("styles", []) or []
-        # Combine genres and styles
-        all_genre_tags = genres + styles
-        all_genres.update(all_genre_tags)
-        
-        # Get format information
-        try:
-            formats = basic.get("formats", [])
-            format_name = formats[0].get("name", "Unknown") if formats and len(formats) > 0 else "Unknown"
-            format_descriptions = formats[0].get("descriptions", []) if formats and len(formats) > 0 and isinstance(formats[0].get("descriptions"), list) else []
-            format_desc = ", ".join(format_descriptions) if format_descriptions else ""
-        except (IndexError, AttributeError, TypeError):
-            format_name = "Unknown"
-            format_desc = ""
-        
-        # Get labels
-        try:
-            labels = basic.get("labels", [])
-            label_names = [label.get("name", "") for label in labels if label and isinstance(label, dict) and label.get("name")]
-        except (TypeError, AttributeError):
-            label_names = []
-        
-        # Get master year (if available)
-        master_id = basic.get("master_id", None)
-        
-        collection.append({
-            "title": basic.get("title", ""),
-            "artist": ", ".join([artist["name"] for artist in basic.get("artists", [])]),
-            "year": basic.get("year", "Unknown"),
-            "thumb": basic.get("thumb", ""),
-            "cover_image": basic.get("cover_image", ""),
-            "id": release_id,
-            "tracks": r.get("tracks", []),  # Now includes tracks!
-            "genres": all_genre_tags,  # Add genres to the collection
-            "play_count": play_counts.get(release_id, 0),  # Add play count
-            "format": format_name,
-            "format_desc": format_desc,
-            "labels": label_names,
-            "styles": styles,
-            "master_id": master_id,
-            "is_current": bool(current_record_id and release_id == current_record_id),
-        })
-    
-    # Sort genres alphabetically for the filter dropdown
-    sorted_genres = sorted([g for g in all_genres if g])  # Filter out empty strings
+    current_record_id = get_current_record(user.username)
 
-    # Filter by search
-    if search_query:
-        collection = [item for item in collection if search_query in item["title"].lower() or search_query in item["artist"].lower()]
+    records = select_records(user, view, sort_by, genre, search_query)
+    collection = [record_dict(release, orders, current_record_id) for release in records]
 
-    # Sort
-    if sort_by == "artist":
-        collection.sort(key=lambda x: x["artist"])
-    elif sort_by == "year":
-        collection.sort(key=lambda x: x["year"] if isinstance(x["year"], int) else 0)
-    elif sort_by == "play_count":
-        collection.sort(key=lambda x: x.get("play_count", 0), reverse=True)  # Highest play count first
+    response = make_response(render_template(
+        "index.html",
+        collection=collection,
+        genres=get_collection_genres(user.username) or view["genres"],
+        selected_genre=genre,
+        stale_since=get_stale_since(user, view),
+        users=list(_collections),
+        current_user=user.username,
+    ))
+    # Remember the picked collection for later visits without ?user=
+    if request.args.get("user"):
+        response.set_cookie("user", user.username, max_age=USER_COOKIE_MAX_AGE, samesite="Lax")
+    return response
 
-    return render_template("index.html", collection=collection, genres=sorted_genres)
+
+@app.route("/api/collection", methods=["GET"])
+@with_request_budget
+def collection_api():
+    """One page of the collection in a given order (?sort=&genre=&search=&offset=&limit=)"""
+    sort_by = request.args.get("sort", "artist")
+    search_query = request.args.get("search", "").lower()
+    genre = request.args.get("genre", "")
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = min(500, max(1, request.args.get("limit", 100, type=int)))
+
+    user = current_user()
+    view = get_collection_view(user)
+    orders = view["orders"]
+    current_record_id = get_current_record(user.username)
+
+    if genre or search_query:
+        records = select_records(user, view, sort_by, genre, search_query)
+        total = len(records)
+        page = records[offset:offset + limit]
+    else:
+        # Unfiltered pages are a straight slice of the pre-built order
+        total = len(orders)
+        page = orders.ordered(sort_by, offset, offset + limit)
+
+    return jsonify({
+        "total": total,
+        "offset": offset,
+        "records": [record_dict(release, orders, current_record_id) for release in page],
+    })
 
 @app.route("/api/play_count", methods=["POST"])
 def update_play_count_api():
@@ -116,13 +368,19 @@ def update_play_count_api():
     if not release_id:
         return jsonify({"error": "release_id is required"}), 400
     
-    new_count = update_play_count(release_id, delta)
+    user = current_user()
+    new_count = update_play_count(user.username, release_id, delta)
+
+    # Move the record within the cached play-count order
+    view = user.view or user.fallback_view
+    if view is not None:
+        view["orders"].set_play_count(release_id, new_count)
 
     # If this was a positive spin, mark as current record (both last played + now playing)
     if delta and delta > 0:
-        set_current_record(release_id)
+        set_current_record(user.username, release_id)
 
-    current_id = get_current_record()
+    current_id = get_current_record(user.username)
 
     return jsonify({"play_count": new_count, "current_record_id": current_id})
 
@@ -133,20 +391,29 @@ def clear_now_playing_api():
     Explicitly clear the 'now playing' state (e.g., record finished and put away).
     We keep track of the last played record separately for LEDs/shelving.
     """
-    clear_now_playing()
-    last_played_id = get_last_played()
+    user = current_user()
+    clear_now_playing(user.username)
+    last_played_id = get_last_played(user.username)
     return jsonify({"current_record_id": None, "last_played_id": last_played_id})
 
 
 @app.route("/api/last_played", methods=["GET"])
 def last_played_api():
     """Small helper endpoint for LED controller to know where the last record belongs."""
-    last_played_id = get_last_played()
+    last_played_id = get_last_played(current_user().username)
     if last_played_id is None:
         return jsonify({"last_played_id": None})
     return jsonify({"last_played_id": last_played_id})
 
+@app.route("/api/stats", methods=["GET"])
+def stats_api():
+    """Listening stats from the summary tables (?limit= entries per list, ?days= of history)"""
+    limit = min(50, max(1, request.args.get("limit", 10, type=int)))
+    days = min(366, max(1, request.args.get("days", 30, type=int)))
+    return jsonify(get_listening_stats(current_user().username, limit, days))
+
 @app.route("/api/lyrics", methods=["GET"])
+@with_request_budget
 def get_lyrics_api():
     """API endpoint to get lyrics for a track"""
     artist = request.args.get("artist")
@@ -155,7 +422,13 @@ def get_lyrics_api():
     if not artist or not track_name:
         return jsonify({"error": "artist and track parameters are required"}), 400
     
-    lyrics = get_lyrics(artist, track_name)
+    try:
+        lyrics = get_lyrics(artist, track_name)
+    except UpstreamUnavailable:
+        # Uncached track and Genius is down or too slow - ask the client to retry later
+        response = jsonify({"error": "Lyrics service unavailable", "stale_since": GENIUS_BREAKER.stale_since})
+        response.headers["Retry-After"] = str(int(GENIUS_BREAKER.probe_interval))
+        return response, 503
     
     if lyrics is None:
         return jsonify({"error": "Lyrics not found"}), 404
@@ -163,10 +436,43 @@ def get_lyrics_api():
     if lyrics == "":
         return jsonify({"error": "Lyrics not available"}), 404
     
+    if GENIUS_BREAKER.is_open:
+        # Served from cache while Genius is unreachable
+        return jsonify({"lyrics": lyrics, "stale_since": GENIUS_BREAKER.stale_since})
     return jsonify({"lyrics": lyrics})
 
+@app.route("/metrics", methods=["GET"])
+def metrics_api():
+    """Prometheus-style metrics (request latency, upstream calls, caches, SQLite, syncs)"""
+    breaker_state = {(("upstream", b.name),): int(b.is_open) for b in (DISCOGS_BREAKER, GENIUS_BREAKER)}
+    body = render_metrics([
+        ("vinyl_upstream_circuit_open", "1 while the upstream's circuit breaker is open", breaker_state),
+        ("vinyl_inflight_requests", "Requests currently being handled", {(): INFLIGHT.active}),
+    ])
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles_api():
+    """Recent request/sync profiles (admin only)"""
+    if not is_admin(request):
+        abort(403)
+    return jsonify({"profiles": list_profiles()})
+
+
+@app.route("/admin/profiles/<name>", methods=["GET"])
+def get_profile_api(name):
+    """Download one profile (.folded for flamegraph.pl/speedscope, .prof for pstats tools)"""
+    if not is_admin(request):
+        abort(403)
+    return send_from_directory(os.path.abspath(PROFILE_DIR), name, as_attachment=True)
+
 if __name__ == "__main__":
     # Allow port to be configured via environment variable (default to 8080 for non-root)
     port = int(os.getenv("FLASK_PORT", 8080))
     debug = os.getenv("FLASK_DEBUG", "False").lower() == "true"
+    # Users with a snapshot re-sync in the background now; the rest on their first page load
+    for user in _collections.values():
+        if user.view is not None:
+            start_background_refresh(user)
+    start_release_refresh(USERS[DEFAULT_USER])
     app.run(host="0.0.0.0", port=port, debug=debug)
\ No newline at end of file
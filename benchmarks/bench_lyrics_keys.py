@@ -0,0 +1,137 @@
+"""
+Benchmark: lyrics cache hit rate of the normalized cache_key versus the
+previous (artist, track_name) key, on a corpus of lookups that spell the same
+songs differently (case, curly apostrophes, Discogs "(2)" suffixes, remaster
+and featuring suffixes, "The"/"&" variants, full-width characters). The corpus
+also has distinct songs that a careless key merges: titles that differ only by
+a leading parenthetical and names made only of punctuation.
+
+Reports, for each key function:
+- hit rate: share of lookups answered from cache (the first lookup of a key misses),
+- ideal: the hit rate if every spelling of a song mapped to one key,
+- keys/song: distinct cache entries per song (1.0 is ideal),
+- false merges: distinct songs that collide on one key (would get wrong lyrics).
+
+Usage: python benchmarks/bench_lyrics_keys.py [--lookups 20000] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lyrics_api import cache_key, clean_artist_name  # noqa: E402
+
+SONGS = [
+    ("AC/DC", "Highway to Hell"),
+    ("AC/DC", "Back in Black"),
+    ("Guns N' Roses", "Sweet Child O' Mine"),
+    ("Queen", "Don't Stop Me Now"),
+    ("The Rolling Stones", "(I Can't Get No) Satisfaction"),
+    ("The Rolling Stones", "Gimme Shelter"),
+    ("Pink Floyd", "Another Brick in the Wall, Part 1"),
+    ("Pink Floyd", "Another Brick in the Wall, Part 2"),
+    ("Pink Floyd", "Shine On You Crazy Diamond (Parts I-V)"),
+    ("Pink Floyd", "Shine On You Crazy Diamond (Parts VI-IX)"),
+    ("Beyoncé", "Crazy in Love"),
+    ("Sigur Rós", "Hoppípolla"),
+    ("Simon & Garfunkel", "The Sound of Silence"),
+    ("Earth, Wind & Fire", "September"),
+    ("Daft Punk", "Get Lucky"),
+    ("Prince", "When Doves Cry"),
+    ("Nirvana", "Smells Like Teen Spirit"),
+    ("Outkast", "Hey Ya!"),
+    ("The Beatles", "Ob-La-Di, Ob-La-Da"),
+    ("The Beatles", "Here Comes the Sun"),
+    ("Fleetwood Mac", "Go Your Own Way"),
+    ("Björk", "Jóga"),
+    ("Television", "Marquee Moon"),
+    ("Talking Heads", "Once in a Lifetime"),
+    ("Bruce Springsteen", "Born to Run"),
+    ("Jay-Z", "99 Problems"),
+    ("Kendrick Lamar", "Alright"),
+    ("The Who", "Won't Get Fooled Again"),
+    ("Lynyrd Skynyrd", "Free Bird"),
+    ("Blondie", "Heart of Glass"),
+    # Leading parentheticals are part of the title, not version noise
+    ("Harry Nilsson", "Without You"),
+    ("Harry Nilsson", "(I Can't Live) Without You"),
+    ("John Denver", "Country Roads"),
+    ("John Denver", "(Take Me Home) Country Roads"),
+    # Names that are nothing but punctuation
+    ("!!!", "Heart of Hearts"),
+    ("???", "Heart of Hearts"),
+    ("Question Mark", "?"),
+    ("Question Mark", "!!!"),
+]
+
+SUFFIXES = [" (Remastered 2011)", " - 2009 Remaster", " [Live]", " (Single Version)", " (Mono)",
+            " - Live at Wembley", " (feat. Somebody)", " feat. Somebody"]
+
+
+def legacy_key(artist, track_name):
+    """The key lyrics were cached under before cache_key()"""
+    return clean_artist_name(artist), track_name.split("(")[0].split("-")[0].strip()
+
+
+def spell(rng, artist, title):
+    """One plausible way the same song shows up in a lookup"""
+    if rng.random() < 0.3:
+        artist = artist.upper() if rng.random() < 0.5 else artist.title()
+    if rng.random() < 0.2:
+        title = title.lower() if rng.random() < 0.5 else title.title()
+    if rng.random() < 0.3:
+        title = title.replace("'", "’")
+        artist = artist.replace("'", "’")
+    if rng.random() < 0.15:
+        artist += f" ({rng.randint(2, 5)})"
+    if rng.random() < 0.1:
+        artist = artist[4:] if artist.lower().startswith("the ") else "The " + artist
+    if rng.random() < 0.1:
+        artist = artist.replace("&", "and") if "&" in artist else artist
+    if rng.random() < 0.05:
+        # Full-width forms, as some Japanese pressings list them
+        artist = "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else c for c in artist)
+    if rng.random() < 0.3:
+        title += rng.choice(SUFFIXES)
+    return artist, title
+
+
+def simulate(lookups, key_fn):
+    seen = set()
+    songs_per_key = defaultdict(set)
+    hits = 0
+    for song_id, artist, title in lookups:
+        key = key_fn(artist, title)
+        hits += key in seen
+        seen.add(key)
+        songs_per_key[key].add(song_id)
+    false_merges = sum(len(songs) - 1 for songs in songs_per_key.values())
+    keys_per_song = len(songs_per_key) / len({song_id for song_id, _, _ in lookups})
+    return hits / len(lookups), keys_per_song, false_merges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lyrics cache hit rates of the old and new cache keys")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lookups = []
+    for _ in range(args.lookups):
+        song_id = rng.randrange(len(SONGS))
+        lookups.append((song_id, *spell(rng, *SONGS[song_id])))
+
+    ideal = 1 - len({song_id for song_id, _, _ in lookups}) / len(lookups)
+    print(f"{len(lookups)} lookups of {len(SONGS)} songs (ideal hit rate {ideal:.1%})")
+    print(f"{'key':<12} {'hit rate':>9} {'keys/song':>10} {'false merges':>13}")
+    for name, key_fn in (("legacy", legacy_key), ("cache_key", cache_key)):
+        hit_rate, keys_per_song, false_merges = simulate(lookups, key_fn)
+        print(f"{name:<12} {hit_rate:>9.1%} {keys_per_song:>10.2f} {false_merges:>13}")
+
+
+if __name__ == "__main__":
+    main()
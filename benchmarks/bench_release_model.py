@@ -0,0 +1,84 @@
+"""
+Benchmark: memory and construction time of the slotted Release model versus
+the previous pipeline (raw Discogs dicts kept alive plus one view dict per record).
+
+Usage: python benchmarks/bench_release_model.py [--size 10000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collection_view import build_collection_view  # noqa: E402
+from benchmarks.synthetic import make_collection  # noqa: E402
+
+
+def build_dict_view(releases):
+    """The per-record dict transform index() used before the Release model"""
+    collection = []
+    for r in releases:
+        basic = r.get("basic_information", {})
+        genres = basic.get("genres", []) or []
+        styles = basic.get("styles", []) or []
+        formats = basic.get("formats", [])
+        descriptions = formats[0].get("descriptions", []) if formats else []
+        collection.append({
+            "title": basic.get("title", ""),
+            "artist": ", ".join([artist["name"] for artist in basic.get("artists", [])]),
+            "year": basic.get("year", "Unknown"),
+            "thumb": basic.get("thumb", ""),
+            "cover_image": basic.get("cover_image", ""),
+            "id": basic.get("id"),
+            "tracks": r.get("tracks", []),
+            "genres": genres + styles,
+            "format": formats[0].get("name", "Unknown") if formats else "Unknown",
+            "format_desc": ", ".join(descriptions),
+            "labels": [label.get("name", "") for label in basic.get("labels", []) if label.get("name")],
+            "styles": styles,
+            "master_id": basic.get("master_id", None),
+        })
+    return collection
+
+
+def measure(label, size, build, keep_raw):
+    """
+    Generate a collection, build the in-memory view from it and report the
+    memory still held afterwards (per release) and the build time.
+    """
+    gc.collect()
+    tracemalloc.start()
+    raw = make_collection(size)
+    result = build(raw)
+    if not keep_raw:
+        # The Release pipeline drops the Discogs dicts once the models are built
+        raw = None
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Time the build again without tracemalloc's overhead
+    fresh = make_collection(size)
+    start = time.perf_counter()
+    build(fresh)
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<16} {retained / size:>8.0f} B/release {elapsed * 1000:>8.1f} ms build")
+    return result, raw
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="number of releases")
+    args = parser.parse_args()
+
+    print(f"releases: {args.size}")
+    measure("dict pipeline", args.size, build_dict_view, keep_raw=True)
+    measure("Release model", args.size, lambda raw: build_collection_view(raw)[0], keep_raw=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: how long does a cold start take to load the collection snapshot?
+
+Usage: python benchmarks/bench_snapshot.py [--size 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collection_view import build_collection_view  # noqa: E402
+from snapshot import load_snapshot, save_snapshot  # noqa: E402
+from benchmarks.synthetic import make_collection  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="number of releases")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed loads")
+    args = parser.parse_args()
+
+    collection, genres = build_collection_view(make_collection(args.size))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot.pkl")
+
+        start = time.perf_counter()
+        save_snapshot(collection, genres, path)
+        save_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            payload = load_snapshot(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        assert payload is not None and len(payload["collection"]) == args.size
+
+        size_kb = os.path.getsize(path) / 1024
+
+    print(f"releases:      {args.size}")
+    print(f"snapshot size: {size_kb:.0f} KiB")
+    print(f"save:          {save_ms:.1f} ms")
+    print(f"load (best):   {min(timings):.1f} ms")
+    print(f"load (median): {sorted(timings)[len(timings) // 2]:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+HTTP load test: drives a realistic mix of requests against a running app and
+reports throughput, latency percentiles and error rates per endpoint at
+increasing concurrency.
+
+By default it starts the Discogs/Genius stand-ins, launches `python app.py`
+against them on a free port (with its own temporary database) and tears
+everything down afterwards. Use --url to target an app that is already
+running instead (e.g. on the Pi).
+
+Usage:
+    python benchmarks/loadtest.py [--size 1000] [--concurrency 1,4,16,32]
+                                  [--duration 10] [--mix index=1,play_count=2,lyrics=3,last_played=4]
+                                  [--url http://pi.local:8080] [--output loadtest.json]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.standins import DiscogsStandin, GeniusStandin  # noqa: E402
+from benchmarks.synthetic import make_collection  # noqa: E402
+
+# Phones mostly browse and tap "I SPUN IT"; the LED controller polls last_played
+DEFAULT_MIX = "index=1,play_count=2,lyrics=3,last_played=4"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoint(s) in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def _index(session, base_url, rng, items):
+    return session.get(f"{base_url}/", params={"sort": rng.choice(["artist", "year", "play_count"])}, timeout=60)
+
+
+def _play_count(session, base_url, rng, items):
+    item = rng.choice(items)
+    return session.post(f"{base_url}/api/play_count", json={"release_id": item["id"], "delta": 1}, timeout=60)
+
+
+def _lyrics(session, base_url, rng, items):
+    item = rng.choice(items)
+    artist = item["basic_information"]["artists"][0]["name"]
+    return session.get(f"{base_url}/api/lyrics", params={"artist": artist, "track": rng.choice(item["tracks"])}, timeout=60)
+
+
+def _last_played(session, base_url, rng, items):
+    return session.get(f"{base_url}/api/last_played", timeout=60)
+
+
+ENDPOINTS = {
+    "index": _index,
+    "play_count": _play_count,
+    "lyrics": _lyrics,
+    "last_played": _last_played,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def run_level(base_url, concurrency, duration, mix, items, seed):
+    """Run `concurrency` workers for `duration` seconds; return per-endpoint samples"""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {name: {"latencies": [], "errors": 0, "shed": 0} for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = ENDPOINTS[name](session, base_url, rng, items)
+                # A 503 with Retry-After is deliberate load shedding, counted separately
+                shed = response.status_code == 503 and "Retry-After" in response.headers
+                # A 404 from /api/lyrics is a valid "no lyrics" answer, not an error
+                failed = not shed and (response.status_code >= 500 or (response.status_code >= 400 and name != "lyrics"))
+            except requests.exceptions.RequestException:
+                shed, failed = False, True
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name]["latencies"].append(elapsed * 1000)
+                if failed:
+                    samples[name]["errors"] += 1
+                if shed:
+                    samples[name]["shed"] += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    report = []
+    for name in names:
+        latencies = sorted(samples[name]["latencies"])
+        count = len(latencies)
+        report.append({
+            "concurrency": concurrency,
+            "endpoint": name,
+            "requests": count,
+            "throughput_rps": round(count / wall, 2),
+            "p50_ms": round(percentile(latencies, 50), 2) if count else None,
+            "p95_ms": round(percentile(latencies, 95), 2) if count else None,
+            "p99_ms": round(percentile(latencies, 99), 2) if count else None,
+            "error_rate": round(samples[name]["errors"] / count, 4) if count else 0.0,
+            "shed_rate": round(samples[name]["shed"] / count, 4) if count else 0.0,
+        })
+    return report
+
+
+def print_report(rows):
+    print(f"{'conc':>5} {'endpoint':<12} {'reqs':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'shed':>7}")
+    for row in rows:
+        fmt = lambda v: f"{v:>9.1f}" if v is not None else f"{'-':>9}"  # noqa: E731
+        print(f"{row['concurrency']:>5} {row['endpoint']:<12} {row['requests']:>7} {row['throughput_rps']:>8.1f} "
+              f"{fmt(row['p50_ms'])} {fmt(row['p95_ms'])} {fmt(row['p99_ms'])} {row['error_rate'] * 100:>6.1f}% {row['shed_rate'] * 100:>6.1f}%")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/last_played", timeout=2).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"App at {base_url} did not come up within {timeout}s")
+
+
+def start_local_app(workdir, discogs, genius):
+    """Launch app.py as a subprocess against the stand-ins; returns (process, base_url)"""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DISCOGS_API_BASE": discogs.base_url,
+        "GENIUS_BASE": genius.base_url,
+        "DISCOGS_REQUEST_DELAY": "0",
+        "DISCOGS_USERNAME": "loadtest",
+        "DISCOGS_TOKEN": "loadtest-token",
+        "FLASK_PORT": str(port),
+        "FLASK_DEBUG": "False",
+    }
+    log = open(os.path.join(workdir, "app.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "app.py")], cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the app's HTTP endpoints")
+    parser.add_argument("--url", help="base URL of an already running app (skips stand-ins and local app)")
+    parser.add_argument("--size", type=int, default=1000, help="synthetic collection size for the stand-ins")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    items = make_collection(args.size)
+
+    rows = []
+    if args.url:
+        base_url = args.url.rstrip("/")
+        wait_until_up(base_url)
+        for level in levels:
+            rows.extend(run_level(base_url, level, args.duration, mix, items, args.seed))
+    else:
+        with DiscogsStandin(items) as discogs, GeniusStandin() as genius, tempfile.TemporaryDirectory() as workdir:
+            process, base_url = start_local_app(workdir, discogs, genius)
+            try:
+                wait_until_up(base_url)
+                # First page load runs the initial sync; don't count it
+                requests.get(f"{base_url}/", timeout=600).raise_for_status()
+                for level in levels:
+                    print(f"concurrency {level} for {args.duration:.0f}s...")
+                    rows.extend(run_level(base_url, level, args.duration, mix, items, args.seed))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+
+    print()
+    print_report(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created_at": int(time.time()), "size": args.size, "mix": mix, "results": rows}, f, indent=2)
+        print(f"\nWrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
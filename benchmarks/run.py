@@ -0,0 +1,188 @@
+"""
+Benchmark suite: times the main paths of the app against a synthetic
+collection served by local Discogs/Genius stand-ins.
+
+Usage:
+    python benchmarks/run.py [--sizes 100,1000,5000] [--output bench_results.json]
+                             [--baseline previous.json] [--max-regression 20]
+
+Results are written as JSON; pass an earlier results file as --baseline to
+print the change per benchmark (and exit non-zero if any median got slower
+than --max-regression percent).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.standins import DiscogsStandin, GeniusStandin  # noqa: E402
+from benchmarks.synthetic import make_collection  # noqa: E402
+
+
+def configure_environment(discogs, genius):
+    """Point the app at the stand-ins. Must run before the app modules are imported."""
+    os.environ.update({
+        "DISCOGS_API_BASE": discogs.base_url,
+        "GENIUS_BASE": genius.base_url,
+        "DISCOGS_REQUEST_DELAY": "0",
+        "DISCOGS_USERNAME": "bench",
+        "DISCOGS_TOKEN": "bench-token",
+        "COLLECTION_REFRESH_SECONDS": "86400",
+        "LOG_LEVEL": "WARNING",
+    })
+
+
+def summarize(name, size, samples):
+    """Turn a list of durations (seconds) into a result record (milliseconds)"""
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "benchmark": name,
+        "size": size,
+        "samples": len(ms),
+        "median_ms": round(statistics.median(ms), 3),
+        "min_ms": round(ms[0], 3),
+        "max_ms": round(ms[-1], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+    }
+
+
+def timed(fn, repeat=1):
+    """Run fn `repeat` times (app output suppressed) and return the durations"""
+    samples = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_size(size, args, discogs, workdir):
+    import app
+    import discogs_api
+    import lyrics_api
+    import snapshot
+
+    # Fresh database and snapshot for every collection size
+    size_dir = os.path.join(workdir, f"size-{size}")
+    os.makedirs(size_dir)
+    os.chdir(size_dir)
+    discogs_api.DB_PATH = lyrics_api.DB_PATH = os.path.join(size_dir, "vinyl_collection.db")
+    user = app._collections["bench"]
+    user.view = user.fallback_view = None
+    user.last_refresh = 0.0
+    user.snapshot_path = snapshot.snapshot_path("bench", os.path.join(size_dir, snapshot.SNAPSHOT_PATH))
+
+    items = make_collection(size, seed=size)
+    discogs.set_collection(items)
+    client = app.app.test_client()
+    results = []
+
+    def record(name, samples):
+        result = summarize(name, size, samples)
+        results.append(result)
+        print(f"  {name:<24} median {result['median_ms']:>10.2f} ms  (n={result['samples']})")
+
+    record("get_collection_cold", timed(lambda: discogs_api.get_collection("bench", "bench-token")))
+    record("get_collection_warm", timed(lambda: discogs_api.get_collection("bench", "bench-token"), args.repeat))
+    record("refresh_collection", timed(lambda: app.refresh_collection(user), args.repeat))
+    record("snapshot_load", timed(lambda: snapshot.load_snapshot(user.snapshot_path), args.repeat))
+
+    def render():
+        assert client.get("/").status_code == 200
+    record("index_render", timed(render, args.repeat))
+
+    # Lyrics: distinct tracks from the collection, first uncached then cached
+    tracks = [(item["basic_information"]["artists"][0]["name"], item["tracks"][0]) for item in items[:args.lyrics]]
+
+    def lyrics_pass():
+        samples = []
+        for artist, track in tracks:
+            samples.extend(timed(lambda: client.get("/api/lyrics", query_string={"artist": artist, "track": track})))
+        return samples
+    record("lyrics_cold", lyrics_pass())
+    record("lyrics_warm", lyrics_pass())
+
+    release_ids = [item["id"] for item in items[:args.lyrics]]
+
+    def play_count_pass():
+        samples = []
+        for release_id in release_ids:
+            samples.extend(timed(lambda: client.post("/api/play_count", json={"release_id": release_id, "delta": 1})))
+        return samples
+    record("play_count_update", play_count_pass())
+    record("stats", timed(lambda: client.get("/api/stats"), args.repeat))
+
+    return results
+
+
+def compare(results, baseline_path, max_regression):
+    """Print the change against a previous results file; return True if within budget"""
+    with open(baseline_path) as f:
+        baseline = {(r["benchmark"], r["size"]): r for r in json.load(f)["results"]}
+
+    ok = True
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result["benchmark"], result["size"]))
+        if not previous or not previous["median_ms"]:
+            continue
+        change = (result["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+        flag = ""
+        if max_regression is not None and change > max_regression:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {result['benchmark']:<24} {result['size']:>6}  {previous['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms  ({change:+.1f}%){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app against local Discogs/Genius stand-ins")
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma-separated collection sizes (up to 20000)")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions for warm paths")
+    parser.add_argument("--lyrics", type=int, default=20, help="number of tracks for lyrics/play-count benchmarks")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="fail if a median is this many percent slower than the baseline")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    with DiscogsStandin() as discogs, GeniusStandin() as genius, tempfile.TemporaryDirectory() as workdir:
+        configure_environment(discogs, genius)
+        cwd = os.getcwd()
+        # Work inside the temp dir so a real snapshot/database in the checkout is never touched
+        os.chdir(workdir)
+        results = []
+        try:
+            for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+                print(f"collection size {size}:")
+                results.extend(run_size(size, args, discogs, workdir))
+        finally:
+            os.chdir(cwd)
+
+    with open(output, "w") as f:
+        json.dump({
+            "created_at": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nWrote {len(results)} results to {output}")
+
+    if baseline and not compare(results, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
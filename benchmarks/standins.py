@@ -0,0 +1,184 @@
+"""
+Local stand-ins for the Discogs API and Genius, for benchmarks and load tests.
+
+Both run as threaded HTTP servers on 127.0.0.1 and are pointed at by setting
+DISCOGS_API_BASE / GENIUS_BASE before the app modules are imported.
+
+- DiscogsStandin serves a synthetic collection with Discogs-style pagination,
+  release details with tracklists, and X-Discogs-Ratelimit-* headers. It
+  answers 429 when the per-minute budget is exceeded (if enforced).
+- GeniusStandin answers /api/search/multi with a song hit and serves song
+  pages whose markup matches what scrape_lyrics_from_genius() looks for.
+"""
+import json
+import math
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload, headers: dict = None):
+        self.send_body(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def do_GET(self):
+        standin = self.server.standin
+        if standin.latency:
+            time.sleep(standin.latency)
+        url = urllib.parse.urlsplit(self.path)
+        standin.requests += 1
+        standin.handle(self, url.path, urllib.parse.parse_qs(url.query))
+
+
+class _Standin:
+    """Base class: owns a ThreadingHTTPServer running in a daemon thread"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # Seconds added to every response
+        self.requests = 0
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, handler, path, query):
+        raise NotImplementedError
+
+
+class DiscogsStandin(_Standin):
+    """Discogs API stand-in serving one synthetic collection (see benchmarks.synthetic)"""
+
+    def __init__(self, collection: list = None, rate_limit: int = 60, enforce_rate_limit: bool = False, latency: float = 0.0):
+        super().__init__(latency)
+        self.rate_limit = rate_limit
+        self.enforce_rate_limit = enforce_rate_limit
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.set_collection(collection or [])
+
+    def set_collection(self, collection: list):
+        self.collection = collection
+        self.by_id = {item["basic_information"]["id"]: item for item in collection}
+
+    def _rate_limit_headers(self):
+        """Sliding one-minute window, like Discogs' X-Discogs-Ratelimit-* headers"""
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and now - self._calls[0] > 60:
+                self._calls.popleft()
+            self._calls.append(now)
+            used = len(self._calls)
+        headers = {
+            "X-Discogs-Ratelimit": str(self.rate_limit),
+            "X-Discogs-Ratelimit-Used": str(min(used, self.rate_limit)),
+            "X-Discogs-Ratelimit-Remaining": str(max(0, self.rate_limit - used)),
+        }
+        return headers, used > self.rate_limit
+
+    def handle(self, handler, path, query):
+        headers, exceeded = self._rate_limit_headers()
+        if exceeded and self.enforce_rate_limit:
+            handler.send_json(429, {"message": "You are making requests too quickly."}, headers)
+            return
+
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            handler.send_json(200, {"hello": "Welcome to the Discogs API stand-in."}, headers)
+        elif len(parts) == 6 and parts[0] == "users" and parts[2:] == ["collection", "folders", "0", "releases"]:
+            per_page = int(query.get("per_page", ["50"])[0])
+            page = int(query.get("page", ["1"])[0])
+            pages = max(1, math.ceil(len(self.collection) / per_page))
+            items = self.collection[(page - 1) * per_page:page * per_page]
+            handler.send_json(200, {
+                "pagination": {"page": page, "pages": pages, "per_page": per_page, "items": len(self.collection)},
+                "releases": [{"id": i["id"], "instance_id": i["instance_id"], "basic_information": i["basic_information"]} for i in items],
+            }, headers)
+        elif len(parts) == 2 and parts[0] == "releases" and parts[1].isdigit() and int(parts[1]) in self.by_id:
+            item = self.by_id[int(parts[1])]
+            tracklist = [{"position": f"A{n + 1}", "type_": "track", "title": title, "duration": "3:30"}
+                         for n, title in enumerate(item["tracks"])]
+            handler.send_json(200, {**item["basic_information"], "tracklist": tracklist}, headers)
+        else:
+            handler.send_json(404, {"message": "The requested resource was not found."}, headers)
+
+
+LYRIC_LINES = [
+    "I put the needle down and let the static fall",
+    "Spinning slow beneath the light along the hall",
+    "Every groove a memory I can't recall",
+    "Turn it over, play the other side of it all",
+]
+
+
+class GeniusStandin(_Standin):
+    """Genius stand-in: search API plus song pages with lyrics containers"""
+
+    def __init__(self, verses: int = 8, latency: float = 0.0):
+        super().__init__(latency)
+        self.verses = verses
+
+    def song_html(self, title: str):
+        verse = "<br/>".join(LYRIC_LINES)
+        containers = "".join(f'<div data-lyrics-container="true">[Verse {n + 1}]<br/>{verse}</div>' for n in range(self.verses))
+        navigation = "".join(f'<a href="/artists/{n}">Related artist {n}</a>' for n in range(40))
+        return (f"<html><head><title>{title} Lyrics</title></head><body>"
+                f"<nav>{navigation}</nav><main><h1>{title} Lyrics</h1>{containers}</main>"
+                f"<footer>{navigation}</footer></body></html>").encode()
+
+    def handle(self, handler, path, query):
+        if path == "/api/search/multi":
+            q = query.get("q", [""])[0]
+            slug = urllib.parse.quote(q.replace(" ", "-"))
+            handler.send_json(200, {"response": {"sections": [
+                {"type": "top_hit", "hits": []},
+                {"type": "song", "hits": [{"result": {
+                    "type": "song",
+                    "title": q,
+                    "url": f"{self.base_url}/songs/{slug}-lyrics",
+                    "path": f"/songs/{slug}-lyrics",
+                    "primary_artist": {"name": q.split(" ")[0]},
+                }}]},
+            ]}})
+        elif path.startswith("/songs/"):
+            handler.send_body(200, self.song_html(urllib.parse.unquote(path[len("/songs/"):])), "text/html; charset=utf-8")
+        elif path == "/":
+            handler.send_body(200, b"<html><body>Genius stand-in</body></html>", "text/html")
+        else:
+            handler.send_json(404, {"meta": {"status": 404}})
@@ -0,0 +1,49 @@
+"""
+Synthetic Discogs collections for benchmarks.
+
+Items have the same shape as the entries returned by the Discogs
+collection/folders/0/releases endpoint (plus the "tracks" list that
+get_collection adds), generated deterministically from a seed.
+"""
+import random
+
+GENRES = ["Rock", "Electronic", "Jazz", "Funk / Soul", "Hip Hop", "Pop", "Folk, World, & Country", "Classical", "Reggae", "Blues"]
+STYLES = ["Indie Rock", "Psychedelic Rock", "Techno", "House", "Soul-Jazz", "Hard Bop", "Boom Bap", "Synth-pop", "Dub", "Ambient", "Prog Rock", "Disco"]
+LABELS = ["Blue Note", "Warp Records", "Sub Pop", "Motown", "Rough Trade", "Stax", "Columbia", "4AD", "Factory", "Impulse!"]
+FORMAT_DESCRIPTIONS = [["LP", "Album"], ["LP", "Album", "Reissue"], ["12\"", "33 ⅓ RPM"], ["LP", "Compilation"], ["7\"", "Single", "45 RPM"]]
+WORDS = ["Blue", "Night", "Electric", "Golden", "Silent", "River", "Dream", "Fire", "Velvet", "Machine", "Summer", "Ghost", "Echo", "Mirror", "Paper", "Moon"]
+
+
+def _phrase(rng, words=2):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_collection(size: int, seed: int = 1):
+    """Return a list of `size` Discogs-shaped collection items"""
+    rng = random.Random(seed)
+    artists = [f"{'The ' if rng.random() < 0.2 else ''}{_phrase(rng)}" for _ in range(max(1, size // 4))]
+
+    items = []
+    for i in range(size):
+        release_id = 1000000 + i
+        artist = rng.choice(artists)
+        tracks = [_phrase(rng, rng.randint(1, 4)) for _ in range(rng.randint(6, 14))]
+        items.append({
+            "id": release_id,
+            "instance_id": 500000000 + i,
+            "basic_information": {
+                "id": release_id,
+                "master_id": 200000 + i if rng.random() < 0.7 else 0,
+                "title": _phrase(rng, rng.randint(1, 3)),
+                "year": rng.choice([0] + list(range(1955, 2025))),
+                "thumb": f"https://i.discogs.com/thumb/{release_id}.jpg",
+                "cover_image": f"https://i.discogs.com/cover/{release_id}.jpg",
+                "artists": [{"name": artist, "id": 10000 + artists.index(artist)}],
+                "labels": [{"name": rng.choice(LABELS), "catno": f"CAT-{i}"}],
+                "formats": [{"name": "Vinyl", "qty": "1", "descriptions": rng.choice(FORMAT_DESCRIPTIONS)}],
+                "genres": rng.sample(GENRES, rng.randint(1, 2)),
+                "styles": rng.sample(STYLES, rng.randint(0, 3)),
+            },
+            "tracks": tracks,
+        })
+    return items
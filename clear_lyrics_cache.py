@@ -1,22 +1,89 @@
 """
-Script to clear all cached lyrics from the database.
-This will remove all existing lyrics so they can be re-fetched with the improved scraping.
+Lyrics cache administration.
+
+    python clear_lyrics_cache.py stats
+    python clear_lyrics_cache.py clear [--negatives] [--older-than DAYS] [--artist NAME] [--release ID] [--yes]
+    python clear_lyrics_cache.py vacuum
+    python clear_lyrics_cache.py refetch [same filters as clear] [--workers 4] [--rate 1] [--restart]
+    python clear_lyrics_cache.py prewarm [--workers 4] [--rate 1] [--restart]
+
+`refetch` re-scrapes cached entries (e.g. after an extractor improvement)
+without losing lyrics that no longer scrape; `prewarm` fetches every track of
+the synced collections that isn't cached yet. Both run on a bounded worker pool,
+never start more than --rate fetches per second, and record progress in a
+file so an interrupted run picks up where it stopped.
+
+Running it with no command (or just --yes) clears all cached lyrics, as before.
 """
-import sqlite3
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import discogs_api
+import lyrics_api
+from models import Release
+from resilience import GENIUS_BREAKER, UpstreamUnavailable
 
 DB_PATH = "vinyl_collection.db"
 
+PROGRESS_PATH = "lyrics_fetch.progress"
+
+
+def connect():
+    lyrics_api.init_lyrics_db()
+    return lyrics_api.connect_db(DB_PATH)
+
+
+def release_keys(release_id: int):
+    """Cache keys for every track of a cached release"""
+    conn = discogs_api.connect_db(DB_PATH)
+    items = discogs_api.load_releases(conn.cursor(), [release_id])
+    conn.close()
+    if not items:
+        raise SystemExit(f"Release {release_id} is not in the releases cache")
+    release = Release.from_api(items[0])
+    # Keyed from the cleaned names, exactly as get_lyrics() stores them
+    return [lyrics_api.cache_key(*lyrics_api.clean_names(release.artist, track)) for track in release.tracks]
+
+
+def build_filter(args):
+    """WHERE clause and parameters selecting the rows matched by the command-line filters"""
+    clauses, params = [], []
+    if args.negatives:
+        clauses.append("lyrics = ''")
+    if args.older_than is not None:
+        clauses.append("fetched_at < ?")
+        params.append(int(time.time() - args.older_than * 86400))
+    if args.artist:
+        # Keys are "<artist>\t<track>", so an artist's entries share a prefix
+        prefix = lyrics_api.cache_key(args.artist, "")
+        clauses.append("substr(cache_key, 1, ?) = ?")
+        params.extend([len(prefix), prefix])
+    if args.release:
+        keys = release_keys(args.release)
+        clauses.append(f"cache_key IN ({', '.join('?' for _ in keys)})" if keys else "0")
+        params.extend(keys)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def has_filters(args):
+    return args.negatives or args.older_than is not None or args.artist or args.release
+
+
 def clear_lyrics_cache():
     """Clear all lyrics from the database"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     cursor = conn.cursor()
-    
+
     # Count how many entries we're deleting
     cursor.execute("SELECT COUNT(*) FROM lyrics")
     count = cursor.fetchone()[0]
-    
+
     print(f"Found {count} cached lyrics entries")
-    
+
     if count > 0:
         # Delete all lyrics
         cursor.execute("DELETE FROM lyrics")
@@ -24,20 +91,257 @@ def clear_lyrics_cache():
         print(f"Successfully cleared {count} lyrics entries from cache")
     else:
         print("No lyrics entries found in cache")
-    
+
     conn.close()
 
-if __name__ == "__main__":
-    import sys
-    # Allow non-interactive mode with --yes flag
-    if len(sys.argv) > 1 and sys.argv[1] == "--yes":
-        clear_lyrics_cache()
-        print("Done! All lyrics will be re-fetched with the improved scraping.")
-    else:
-        confirm = input("Are you sure you want to clear all cached lyrics? (yes/no): ")
-        if confirm.lower() == "yes":
+
+def confirm(question, args):
+    if args.yes:
+        return True
+    return input(f"{question} (yes/no): ").lower() == "yes"
+
+
+def cmd_stats(args):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*), SUM(lyrics = ''), COALESCE(SUM(LENGTH(lyrics)), 0), MIN(fetched_at), MAX(fetched_at)
+        FROM lyrics
+    """)
+    total, negatives, text_bytes, oldest, newest = cursor.fetchone()
+    cursor.execute("PRAGMA page_count")
+    page_count = cursor.fetchone()[0]
+    cursor.execute("PRAGMA freelist_count")
+    free_pages = cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_size")
+    page_size = cursor.fetchone()[0]
+    cursor.execute("SELECT artist, COUNT(*) FROM lyrics GROUP BY artist ORDER BY COUNT(*) DESC LIMIT 5")
+    top_artists = cursor.fetchall()
+    conn.close()
+
+    def day(ts):
+        return time.strftime("%Y-%m-%d", time.localtime(ts)) if ts else "-"
+
+    negatives = negatives or 0
+    print(f"Entries:        {total}")
+    print(f"  with lyrics:  {total - negatives}")
+    print(f"  not found:    {negatives}")
+    print(f"Lyrics text:    {text_bytes / 1024:.1f} KiB")
+    print(f"Fetched:        {day(oldest)} .. {day(newest)}")
+    print(f"Database file:  {page_count * page_size / 1024:.1f} KiB ({free_pages * page_size / 1024:.1f} KiB reclaimable by vacuum)")
+    if top_artists:
+        print("Most cached artists: " + ", ".join(f"{artist} ({count})" for artist, count in top_artists))
+
+
+def cmd_clear(args):
+    if not has_filters(args):
+        if confirm("Are you sure you want to clear all cached lyrics?", args):
             clear_lyrics_cache()
             print("Done! All lyrics will be re-fetched with the improved scraping.")
         else:
             print("Cancelled. No changes made.")
+        return
+
+    where, params = build_filter(args)
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM lyrics{where}", params)
+    count = cursor.fetchone()[0]
+    print(f"{count} cached lyrics entries match")
+    if count and confirm(f"Delete {count} entries?", args):
+        cursor.execute(f"DELETE FROM lyrics{where}", params)
+        conn.commit()
+        print(f"Cleared {count} lyrics entries from cache")
+    conn.close()
+
+
+def cmd_vacuum(args):
+    if not os.path.exists(DB_PATH):
+        print(f"No database at {DB_PATH}, nothing to vacuum")
+        return
+    before = os.path.getsize(DB_PATH)
+    conn = connect()
+    conn.execute("VACUUM")
+    conn.close()
+    after = os.path.getsize(DB_PATH)
+    print(f"Vacuumed {DB_PATH}: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB")
+
 
+class RateLimiter:
+    """Spaces out calls across threads so at most `rate` start per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(max(0, start - now))
+
+
+def describe_job(args):
+    """The command, database and filters a progress file belongs to (its first line)"""
+    filters = {name: getattr(args, name, None) for name in ("negatives", "older_than", "artist", "release")}
+    return f"# {args.command} db={os.path.abspath(DB_PATH)} " + " ".join(f"{name}={value!r}" for name, value in filters.items())
+
+
+def load_progress(path, restart, job):
+    """Keys finished by an interrupted run of the same job; empty if there's none to resume"""
+    if restart or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        header = f.readline().rstrip("\n")
+        if header != job:
+            # Keys done by a run with other filters say nothing about this one
+            print(f"Ignoring {path}: it is from a different run ({header or 'unknown'})")
+            return set()
+        return {tuple(line.rstrip("\n").split("\t", 1)) for line in f if "\t" in line}
+
+
+def run_fetches(keys, args, previous=None):
+    """
+    Fetch lyrics for (artist, track_name) keys on a worker pool.
+
+    `previous` maps keys to lyrics already cached; a failed re-fetch leaves
+    those in place rather than overwriting them with a "not found".
+    """
+    previous = previous or {}
+    job = describe_job(args)
+    done = load_progress(args.progress, args.restart, job)
+    todo = [key for key in keys if key not in done]
+    if done:
+        print(f"Resuming: {len(keys) - len(todo)} of {len(keys)} already done (--restart to start over)")
+    if not todo:
+        print("Nothing to fetch")
+        if done:
+            os.remove(args.progress)
+        return
+
+    limiter = RateLimiter(args.rate)
+    progress_lock = threading.Lock()
+    counts = {"found": 0, "missing": 0, "failed": 0}
+    if done:
+        progress = open(args.progress, "a")
+    else:
+        progress = open(args.progress, "w")
+        progress.write(job + "\n")
+        progress.flush()
+
+    def fetch(key):
+        artist, track_name = key
+        # Don't burn through the list while Genius is down; wait for the breaker's probe
+        while GENIUS_BREAKER.is_open:
+            time.sleep(GENIUS_BREAKER.probe_interval)
+        limiter.wait()
+        try:
+            lyrics = lyrics_api.fetch_lyrics(artist, track_name, cache_misses=not previous.get(key))
+        except UpstreamUnavailable:
+            result = "failed"
+        else:
+            result = "found" if lyrics else "missing"
+        with progress_lock:
+            counts[result] += 1
+            if result != "failed":
+                progress.write(f"{artist}\t{track_name}\n")
+                progress.flush()
+            finished = sum(counts.values())
+            if finished % 25 == 0 or finished == len(todo):
+                print(f"  {finished}/{len(todo)}: {counts['found']} found, {counts['missing']} not found, {counts['failed']} failed")
+
+    print(f"Fetching lyrics for {len(todo)} tracks with {args.workers} workers at up to {args.rate:g}/s")
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(fetch, todo))
+    finally:
+        progress.close()
+
+    if counts["failed"]:
+        print(f"{counts['failed']} fetches failed; run the same command again to retry them")
+    else:
+        os.remove(args.progress)
+
+
+def cmd_refetch(args):
+    where, params = build_filter(args)
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT artist, track_name, lyrics FROM lyrics{where} ORDER BY id", params)
+    previous = {(artist, track_name): lyrics for artist, track_name, lyrics in cursor.fetchall()}
+    conn.close()
+    run_fetches(list(previous), args, previous)
+
+
+def cmd_prewarm(args):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT cache_key FROM lyrics")
+    cached = {row[0] for row in cursor.fetchall()}
+    conn.close()
+
+    # One fetch per distinct cache key across every user's collection, sent to Genius with the cleaned names
+    names = {}
+    for username in discogs_api.get_synced_usernames():
+        for item in discogs_api.get_cached_collection(username):
+            release = Release.from_api(item)
+            for track in release.tracks:
+                clean = lyrics_api.clean_names(release.artist, track)
+                key = lyrics_api.cache_key(*clean)
+                if track.strip() and key not in cached:
+                    names.setdefault(key, clean)
+    run_fetches(list(names.values()), args)
+
+
+def main(argv=None):
+    global DB_PATH
+
+    parser = argparse.ArgumentParser(description="Inspect and maintain the lyrics cache")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--yes", action="store_true", help="don't ask for confirmation")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("stats", help="show cache size, hit/miss entries and age")
+
+    def add_filters(sub):
+        sub.add_argument("--negatives", action="store_true", help="only cached 'not found' entries")
+        sub.add_argument("--older-than", type=float, metavar="DAYS", help="only entries fetched more than DAYS ago")
+        sub.add_argument("--artist", help="only entries for this artist")
+        sub.add_argument("--release", type=int, metavar="ID", help="only tracks of this Discogs release")
+
+    def add_fetch_options(sub):
+        sub.add_argument("--workers", type=int, default=4, help="concurrent fetches (default: %(default)s)")
+        sub.add_argument("--rate", type=float, default=1.0, help="max fetches started per second (default: %(default)s)")
+        sub.add_argument("--progress", default=PROGRESS_PATH, help="progress file for resuming (default: %(default)s)")
+        sub.add_argument("--restart", action="store_true", help="ignore an existing progress file")
+
+    clear = commands.add_parser("clear", help="delete cached entries (all of them without filters)")
+    add_filters(clear)
+    clear.add_argument("--yes", action="store_true", default=argparse.SUPPRESS, help="don't ask for confirmation")
+    commands.add_parser("vacuum", help="reclaim space freed by deleted entries")
+    refetch = commands.add_parser("refetch", help="re-scrape cached entries")
+    add_filters(refetch)
+    add_fetch_options(refetch)
+    add_fetch_options(commands.add_parser("prewarm", help="fetch lyrics for every uncached track in the synced collections"))
+
+    args = parser.parse_args(argv)
+    DB_PATH = lyrics_api.DB_PATH = discogs_api.DB_PATH = args.db
+
+    if args.command is None:
+        # Backwards compatible: no command clears everything
+        args.command = "clear"
+        args.negatives, args.older_than, args.artist, args.release = False, None, None, None
+
+    {
+        "stats": cmd_stats,
+        "clear": cmd_clear,
+        "vacuum": cmd_vacuum,
+        "refetch": cmd_refetch,
+        "prewarm": cmd_prewarm,
+    }[args.command](args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,38 @@
+from models import Release
+from sort_index import SortIndex
+
+
+def build_collection_view(releases):
+    """
+    Turn raw Discogs collection items into the Release records the page renders.
+
+    Returns (collection, genres). Per-request fields (play_count, is_current)
+    are not included here - they are layered on top when serving a page.
+    """
+    collection = []
+    all_genres = set()  # Collect all unique genres
+
+    for r in releases:
+        release = Release.from_api(r)
+        all_genres.update(release.genres)
+        collection.append(release)
+
+    # Sort genres alphabetically for the filter dropdown
+    sorted_genres = sorted([g for g in all_genres if g])  # Filter out empty strings
+
+    return collection, sorted_genres
+
+
+def make_view(collection: list, genres: list, created_at, play_counts: dict):
+    """
+    Bundle the rendered records into the in-memory view served by index(),
+    including the pre-built sort orders for this collection version.
+
+    `created_at` is when the data was synced from Discogs (None if unknown).
+    """
+    return {
+        "collection": collection,
+        "genres": genres,
+        "created_at": created_at,
+        "orders": SortIndex(collection, play_counts),
+    }
@@ -1,14 +1,39 @@
+import logging
+import os
 import requests
 import sqlite3
+import threading
 import time
 import json
 
-API_BASE = "https://api.discogs.com"
+from resilience import DISCOGS_BREAKER, DISCOGS_RATE, UpstreamUnavailable, upstream_get
+from listening_stats import apply_play_change, create_stats_tables, read_stats, rebuild_stats
+from metrics import connect as connect_db, record_cache_lookup
+from users import default_username
+
+API_BASE = os.getenv("DISCOGS_API_BASE", "https://api.discogs.com")
+
+logger = logging.getLogger(__name__)
 DB_PATH = "vinyl_collection.db"  # Adjust path as needed
 
+# Database paths whose schema has already been created/migrated by this process
+_initialized_dbs = set()
+_init_lock = threading.Lock()
+
 def init_db():
+    """Create and migrate the tables, once per database and process"""
+    if DB_PATH in _initialized_dbs:
+        return
+    # The migrations aren't safe to run twice, and the first call can come from
+    # request threads and background threads at once
+    with _init_lock:
+        if DB_PATH not in _initialized_dbs:
+            _create_tables()
+            _initialized_dbs.add(DB_PATH)
+
+def _create_tables():
     """Create tables if they don't exist"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
     # Check if collection_cache table exists and has correct structure
@@ -20,30 +45,32 @@ def init_db():
             # Verify table structure by checking columns
             cursor.execute("PRAGMA table_info(collection_cache)")
             columns = [row[1] for row in cursor.fetchall()]
-            expected_columns = ['id', 'last_updated', 'collection_count', 'release_ids_hash']
+            expected_columns = ['username', 'last_updated', 'collection_count', 'release_ids_hash']
             
             if not all(col in columns for col in expected_columns):
                 # Table exists but structure is wrong, drop and recreate
-                print("collection_cache table structure mismatch, recreating...")
+                logger.warning("collection_cache table structure mismatch, recreating...")
                 cursor.execute("DROP TABLE IF EXISTS collection_cache")
                 table_exists = False
     except sqlite3.OperationalError:
         # Table doesn't exist or database error
         table_exists = False
     
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS releases (
-            release_id INTEGER PRIMARY KEY,
-            data TEXT NOT NULL,
-            tracks TEXT NOT NULL,
-            fetched_at INTEGER NOT NULL
-        )
-    """)
+    # Older databases stored each release as JSON blobs; move them to the normalized tables
+    cursor.execute("PRAGMA table_info(releases)")
+    legacy_blob_table = "data" in [row[1] for row in cursor.fetchall()]
+    if legacy_blob_table:
+        cursor.execute("ALTER TABLE releases RENAME TO releases_legacy")
+
+    create_release_tables(cursor)
+
+    if legacy_blob_table:
+        migrate_legacy_releases(cursor)
     
     if not table_exists:
         cursor.execute("""
             CREATE TABLE collection_cache (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
+                username TEXT PRIMARY KEY,
                 last_updated INTEGER NOT NULL,
                 collection_count INTEGER,
                 release_ids_hash TEXT
@@ -53,46 +80,15 @@ def init_db():
         # Table exists with correct structure, just ensure it exists
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS collection_cache (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
+                username TEXT PRIMARY KEY,
                 last_updated INTEGER NOT NULL,
                 collection_count INTEGER,
                 release_ids_hash TEXT
             )
         """)
     
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS play_counts (
-            release_id INTEGER PRIMARY KEY,
-            play_count INTEGER NOT NULL DEFAULT 0
-        )
-    """)
-
-    # Track the most recently spun record (logical "last played")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS current_record (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            release_id INTEGER,
-            updated_at INTEGER NOT NULL
-        )
-    """)
-
-    # Track what is currently spinning (separate from last played)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS now_playing (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            release_id INTEGER,
-            updated_at INTEGER NOT NULL
-        )
-    """)
-
-    # Track the most recently spun record (single-row table)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS current_record (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            release_id INTEGER,
-            updated_at INTEGER NOT NULL
-        )
-    """)
+    # Play counts, now playing, last played and collection membership, per user
+    create_user_tables(cursor)
     
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS lyrics (
@@ -105,53 +101,336 @@ def init_db():
         )
     """)
     
+    # Listening stats summaries (seeded from existing play counts on first run)
+    if create_stats_tables(cursor, default_username() or ""):
+        cursor.execute("SELECT DISTINCT username FROM collection_releases")
+        for (username,) in cursor.fetchall():
+            rebuild_stats(cursor, username)
+    
     conn.commit()
     conn.close()
 
 
-def set_current_record(release_id: int):
+def create_release_tables(cursor):
+    """
+    Normalized release cache: one row per release plus child tables for
+    artists, labels, genres/styles, formats and tracks, so the collection can
+    be filtered by genre in SQL (sorting is done in memory by SortIndex).
     """
-    Set the most recently spun record AND mark it as currently spinning.
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS releases (
+            release_id INTEGER PRIMARY KEY,
+            master_id INTEGER,
+            title TEXT NOT NULL DEFAULT '',
+            year INTEGER NOT NULL DEFAULT 0,
+            thumb TEXT NOT NULL DEFAULT '',
+            cover_image TEXT NOT NULL DEFAULT '',
+            artist_display TEXT NOT NULL DEFAULT '',
+            fetched_at INTEGER NOT NULL
+        );
+        -- Sorting moved to SortIndex; nothing reads these any more and they slowed every store_release()
+        DROP INDEX IF EXISTS idx_releases_year;
+        DROP INDEX IF EXISTS idx_releases_artist;
+
+        CREATE TABLE IF NOT EXISTS artists (
+            artist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS release_artists (
+            release_id INTEGER NOT NULL REFERENCES releases (release_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            artist_id INTEGER NOT NULL REFERENCES artists (artist_id),
+            PRIMARY KEY (release_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_release_artists_artist ON release_artists (artist_id);
+
+        CREATE TABLE IF NOT EXISTS labels (
+            label_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS release_labels (
+            release_id INTEGER NOT NULL REFERENCES releases (release_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            label_id INTEGER NOT NULL REFERENCES labels (label_id),
+            catno TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (release_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_release_labels_label ON release_labels (label_id);
+
+        -- Genres and styles share one table, told apart by kind
+        CREATE TABLE IF NOT EXISTS tags (
+            tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL CHECK (kind IN ('genre', 'style')),
+            name TEXT NOT NULL,
+            UNIQUE (kind, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_tags_name ON tags (name);
+        CREATE TABLE IF NOT EXISTS release_tags (
+            release_id INTEGER NOT NULL REFERENCES releases (release_id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags (tag_id),
+            position INTEGER NOT NULL,
+            PRIMARY KEY (release_id, tag_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_release_tags_tag ON release_tags (tag_id);
+
+        CREATE TABLE IF NOT EXISTS release_formats (
+            release_id INTEGER NOT NULL REFERENCES releases (release_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL DEFAULT '',
+            qty TEXT NOT NULL DEFAULT '',
+            descriptions TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (release_id, position)
+        );
+
+        CREATE TABLE IF NOT EXISTS tracks (
+            release_id INTEGER NOT NULL REFERENCES releases (release_id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            PRIMARY KEY (release_id, position)
+        );
+    """)
+
+
+# Per-user state: {table: (columns, columns carried over from single-user databases)}
+_USER_TABLES = {
+    "play_counts": ("""
+        username TEXT NOT NULL,
+        release_id INTEGER NOT NULL,
+        play_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (username, release_id)
+    """, "release_id, play_count"),
+    # The most recently spun record (logical "last played")
+    "current_record": ("""
+        username TEXT PRIMARY KEY,
+        release_id INTEGER,
+        updated_at INTEGER NOT NULL
+    """, "release_id, updated_at"),
+    # What is currently spinning (separate from last played)
+    "now_playing": ("""
+        username TEXT PRIMARY KEY,
+        release_id INTEGER,
+        updated_at INTEGER NOT NULL
+    """, "release_id, updated_at"),
+    # Which releases are in each user's synced collection, in Discogs order
+    "collection_releases": ("""
+        username TEXT NOT NULL,
+        release_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        PRIMARY KEY (username, release_id)
+    """, "release_id, position"),
+}
+
+
+def create_user_tables(cursor):
+    """
+    Tables holding each user's own state, keyed by username. The release cache
+    itself is shared. Tables from single-user databases (one row, or one row
+    per release, for the only user) are migrated to the default user.
+    """
+    owner = None
+    for table, (columns, carried_columns) in _USER_TABLES.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing_columns = [row[1] for row in cursor.fetchall()]
+        if existing_columns and "username" not in existing_columns:
+            if owner is None:
+                owner = default_username() or ""
+            logger.info("Migrating %s to per-user rows for %r", table, owner)
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_single_user")
+            cursor.execute(f"CREATE TABLE {table} ({columns})")
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO {table} (username, {carried_columns})
+                SELECT ?, {carried_columns} FROM {table}_single_user
+            """, (owner,))
+            cursor.execute(f"DROP TABLE {table}_single_user")
+        else:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    # Shared-release lookups ("is this release in anyone's collection?")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_collection_releases_release ON collection_releases (release_id)")
+
+
+def migrate_legacy_releases(cursor):
+    """Copy rows from the old JSON-blob releases table into the normalized tables"""
+    cursor.execute("SELECT release_id, data, tracks, fetched_at FROM releases_legacy")
+    rows = cursor.fetchall()
+    for release_id, data, tracks, fetched_at in rows:
+        try:
+            store_release(cursor, release_id, json.loads(data), json.loads(tracks), fetched_at)
+        except (ValueError, TypeError) as e:
+            logger.warning("Skipping unreadable cached release %s: %s", release_id, e)
+    cursor.execute("DROP TABLE releases_legacy")
+    logger.info("Migrated %d cached release(s) to the normalized schema", len(rows))
+
+
+def _get_or_create_id(cursor, table: str, id_column: str, name: str):
+    cursor.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+    cursor.execute(f"SELECT {id_column} FROM {table} WHERE name = ?", (name,))
+    return cursor.fetchone()[0]
+
+
+def _get_or_create_tag(cursor, kind: str, name: str):
+    cursor.execute("INSERT OR IGNORE INTO tags (kind, name) VALUES (?, ?)", (kind, name))
+    cursor.execute("SELECT tag_id FROM tags WHERE kind = ? AND name = ?", (kind, name))
+    return cursor.fetchone()[0]
+
+
+def store_release(cursor, release_id: int, basic: dict, tracks: list, fetched_at: int):
+    """Write one release (Discogs basic_information + track titles) to the normalized tables"""
+    artists = [a.get("name", "") for a in basic.get("artists", []) or [] if isinstance(a, dict) and a.get("name")]
+    year = basic.get("year")
+
+    cursor.execute("""
+        INSERT OR REPLACE INTO releases (release_id, master_id, title, year, thumb, cover_image, artist_display, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        release_id,
+        basic.get("master_id"),
+        basic.get("title", "") or "",
+        year if isinstance(year, int) else 0,
+        basic.get("thumb", "") or "",
+        basic.get("cover_image", "") or "",
+        ", ".join(artists),
+        fetched_at,
+    ))
+
+    for table in ("release_artists", "release_labels", "release_tags", "release_formats", "tracks"):
+        cursor.execute(f"DELETE FROM {table} WHERE release_id = ?", (release_id,))
+
+    for position, name in enumerate(artists):
+        artist_id = _get_or_create_id(cursor, "artists", "artist_id", name)
+        cursor.execute("INSERT INTO release_artists (release_id, position, artist_id) VALUES (?, ?, ?)",
+                       (release_id, position, artist_id))
+
+    labels = [l for l in basic.get("labels", []) or [] if isinstance(l, dict) and l.get("name")]
+    for position, label in enumerate(labels):
+        label_id = _get_or_create_id(cursor, "labels", "label_id", label["name"])
+        cursor.execute("INSERT INTO release_labels (release_id, position, label_id, catno) VALUES (?, ?, ?, ?)",
+                       (release_id, position, label_id, label.get("catno", "") or ""))
+
+    tags = [("genre", g) for g in basic.get("genres", []) or [] if g] + [("style", st) for st in basic.get("styles", []) or [] if st]
+    for position, (kind, name) in enumerate(tags):
+        tag_id = _get_or_create_tag(cursor, kind, name)
+        cursor.execute("INSERT OR IGNORE INTO release_tags (release_id, tag_id, position) VALUES (?, ?, ?)",
+                       (release_id, tag_id, position))
+
+    formats = [f for f in basic.get("formats", []) or [] if isinstance(f, dict)]
+    for position, fmt in enumerate(formats):
+        descriptions = fmt.get("descriptions") if isinstance(fmt.get("descriptions"), list) else []
+        cursor.execute("INSERT INTO release_formats (release_id, position, name, qty, descriptions) VALUES (?, ?, ?, ?, ?)",
+                       (release_id, position, fmt.get("name", "") or "", fmt.get("qty", "") or "", ", ".join(descriptions)))
+
+    cursor.executemany("INSERT INTO tracks (release_id, position, title) VALUES (?, ?, ?)",
+                       [(release_id, position, title) for position, title in enumerate(tracks)])
+
+
+def load_releases(cursor, release_ids=None, username: str = None):
+    """
+    Read cached releases back into Discogs-shaped items
+    ({"basic_information": {...}, "tracks": [...]}).
+
+    With no release_ids, returns `username`'s synced collection in Discogs order.
+    """
+    if release_ids is None:
+        cursor.execute("""
+            SELECT r.release_id, r.master_id, r.title, r.year, r.thumb, r.cover_image
+            FROM collection_releases c JOIN releases r ON r.release_id = c.release_id
+            WHERE c.username = ?
+            ORDER BY c.position
+        """, (username,))
+        child_filter, params = "", ()
+    else:
+        placeholders = ", ".join("?" for _ in release_ids)
+        cursor.execute(f"""
+            SELECT release_id, master_id, title, year, thumb, cover_image
+            FROM releases WHERE release_id IN ({placeholders})
+        """, tuple(release_ids))
+        child_filter, params = f"WHERE x.release_id IN ({placeholders})", tuple(release_ids)
+
+    items = {}
+    for release_id, master_id, title, year, thumb, cover_image in cursor.fetchall():
+        items[release_id] = {
+            "basic_information": {
+                "id": release_id,
+                "master_id": master_id,
+                "title": title,
+                "year": year,
+                "thumb": thumb,
+                "cover_image": cover_image,
+                "artists": [],
+                "labels": [],
+                "formats": [],
+                "genres": [],
+                "styles": [],
+            },
+            "tracks": [],
+        }
+
+    def rows(query):
+        cursor.execute(query.format(where=child_filter), params)
+        for row in cursor.fetchall():
+            item = items.get(row[0])
+            if item is not None:
+                yield item["basic_information"], row[1:]
+
+    for basic, (name,) in rows("SELECT x.release_id, a.name FROM release_artists x JOIN artists a USING (artist_id) {where} ORDER BY x.release_id, x.position"):
+        basic["artists"].append({"name": name})
+    for basic, (name, catno) in rows("SELECT x.release_id, l.name, x.catno FROM release_labels x JOIN labels l USING (label_id) {where} ORDER BY x.release_id, x.position"):
+        basic["labels"].append({"name": name, "catno": catno})
+    for basic, (kind, name) in rows("SELECT x.release_id, t.kind, t.name FROM release_tags x JOIN tags t USING (tag_id) {where} ORDER BY x.release_id, x.position"):
+        basic["genres" if kind == "genre" else "styles"].append(name)
+    for basic, (name, qty, descriptions) in rows("SELECT x.release_id, x.name, x.qty, x.descriptions FROM release_formats x {where} ORDER BY x.release_id, x.position"):
+        basic["formats"].append({"name": name, "qty": qty, "descriptions": descriptions.split(", ") if descriptions else []})
+
+    cursor.execute(f"SELECT x.release_id, x.title FROM tracks x {child_filter} ORDER BY x.release_id, x.position", params)
+    for release_id, title in cursor.fetchall():
+        if release_id in items:
+            items[release_id]["tracks"].append(title)
+
+    return list(items.values())
+
+
+def set_current_record(username: str, release_id: int):
+    """
+    Set the user's most recently spun record AND mark it as currently spinning.
 
     - current_record.release_id = last played (persists even after stopped)
     - now_playing.release_id   = currently spinning (cleared when user stops)
     """
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute(
         """
-        INSERT OR REPLACE INTO current_record (id, release_id, updated_at)
-        VALUES (1, ?, ?)
+        INSERT OR REPLACE INTO current_record (username, release_id, updated_at)
+        VALUES (?, ?, ?)
         """,
-        (release_id, int(time.time())),
+        (username, release_id, int(time.time())),
     )
 
     cursor.execute(
         """
-        INSERT OR REPLACE INTO now_playing (id, release_id, updated_at)
-        VALUES (1, ?, ?)
+        INSERT OR REPLACE INTO now_playing (username, release_id, updated_at)
+        VALUES (?, ?, ?)
         """,
-        (release_id, int(time.time())),
+        (username, release_id, int(time.time())),
     )
 
     conn.commit()
     conn.close()
 
 
-def get_current_record():
+def get_current_record(username: str):
     """
-    Get the record that is currently spinning, or None.
+    Get the record that is currently spinning for a user, or None.
 
     This reads from the now_playing table.
     """
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute(
-        "SELECT release_id FROM now_playing WHERE id = 1"
+        "SELECT release_id FROM now_playing WHERE username = ?", (username,)
     )
     row = cursor.fetchone()
 
@@ -159,29 +438,29 @@ def get_current_record():
     return row[0] if row else None
 
 
-def clear_now_playing():
-    """Clear the 'currently spinning' record but keep last played."""
+def clear_now_playing(username: str):
+    """Clear the user's 'currently spinning' record but keep last played."""
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute(
-        "UPDATE now_playing SET release_id = NULL, updated_at = ? WHERE id = 1",
-        (int(time.time()),),
+        "UPDATE now_playing SET release_id = NULL, updated_at = ? WHERE username = ?",
+        (int(time.time()), username),
     )
 
     conn.commit()
     conn.close()
 
 
-def get_last_played():
-    """Return the last played record id (current_record), or None."""
+def get_last_played(username: str):
+    """Return the user's last played record id (current_record), or None."""
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
 
     cursor.execute(
-        "SELECT release_id FROM current_record WHERE id = 1"
+        "SELECT release_id FROM current_record WHERE username = ?", (username,)
     )
     row = cursor.fetchone()
 
@@ -190,45 +469,114 @@ def get_last_played():
 
 def get_cached_release(release_id: int):
     """Get release data from cache"""
-    conn = sqlite3.connect(DB_PATH)
+    init_db()
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT data, tracks FROM releases WHERE release_id = ?",
-        (release_id,)
-    )
-    row = cursor.fetchone()
+    items = load_releases(cursor, [release_id])
     conn.close()
-    
-    if row:
-        return json.loads(row[0]), json.loads(row[1])
+
+    if items:
+        return items[0]["basic_information"], items[0]["tracks"]
     return None, None
 
-def get_play_count(release_id: int):
-    """Get play count for a release"""
+def get_cached_tracks():
+    """Get the cached track titles of every release as {release_id: [titles]}"""
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT release_id, title FROM tracks ORDER BY release_id, position")
+    tracks = {}
+    for release_id, title in cursor.fetchall():
+        tracks.setdefault(release_id, []).append(title)
+    conn.close()
+    return tracks
+
+def get_cached_collection(username: str):
+    """
+    Rebuild a user's collection list from the releases cache without calling Discogs.
+
+    Used as a degraded-mode fallback when Discogs is unreachable and there is no
+    snapshot to serve. Items have the same shape as get_collection() returns.
+    """
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    items = load_releases(cursor, username=username)
+    cursor.execute("SELECT 1 FROM collection_releases LIMIT 1")
+    if not items and cursor.fetchone() is None:
+        # No membership recorded for anyone yet - fall back to everything cached
+        cursor.execute("SELECT release_id FROM releases")
+        items = load_releases(cursor, [row[0] for row in cursor.fetchall()])
+    conn.close()
+    return items
+
+def get_synced_usernames():
+    """Users with a synced collection"""
+    init_db()
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT username FROM collection_releases ORDER BY username")
+    usernames = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return usernames
+
+def get_collection_genres(username: str):
+    """All genres and styles used by records in a user's collection, alphabetically"""
+    init_db()
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT t.name
+        FROM tags t
+        JOIN release_tags rt ON rt.tag_id = t.tag_id
+        JOIN collection_releases c ON c.release_id = rt.release_id
+        WHERE c.username = ? AND t.name != ''
+        ORDER BY t.name
+    """, (username,))
+    genres = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return genres
+
+def get_genre_release_ids(username: str, genre: str):
+    """Ids of a user's releases tagged with a genre or style (indexed lookup)"""
+    init_db()
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT rt.release_id
+        FROM tags t
+        JOIN release_tags rt ON rt.tag_id = t.tag_id
+        JOIN collection_releases c ON c.release_id = rt.release_id
+        WHERE c.username = ? AND t.name = ?
+    """, (username, genre))
+    release_ids = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    return release_ids
+
+def get_play_count(username: str, release_id: int):
+    """Get a user's play count for a release"""
+    init_db()
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute(
-        "SELECT play_count FROM play_counts WHERE release_id = ?",
-        (release_id,)
+        "SELECT play_count FROM play_counts WHERE username = ? AND release_id = ?",
+        (username, release_id)
     )
     row = cursor.fetchone()
     conn.close()
     
     return row[0] if row else 0
 
-def update_play_count(release_id: int, delta: int):
-    """Update play count for a release (delta can be +1 or -1)"""
+def update_play_count(username: str, release_id: int, delta: int):
+    """Update a user's play count for a release (delta can be +1 or -1)"""
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
     # Get current count
     cursor.execute(
-        "SELECT play_count FROM play_counts WHERE release_id = ?",
-        (release_id,)
+        "SELECT play_count FROM play_counts WHERE username = ? AND release_id = ?",
+        (username, release_id)
     )
     row = cursor.fetchone()
     current_count = row[0] if row else 0
@@ -238,39 +586,85 @@ def update_play_count(release_id: int, delta: int):
     
     # Update or insert
     cursor.execute("""
-        INSERT OR REPLACE INTO play_counts (release_id, play_count)
-        VALUES (?, ?)
-    """, (release_id, new_count))
+        INSERT OR REPLACE INTO play_counts (username, release_id, play_count)
+        VALUES (?, ?, ?)
+    """, (username, release_id, new_count))
+    
+    # Keep the /api/stats summaries in step, in the same transaction
+    apply_play_change(cursor, username, release_id, current_count, new_count)
     
     conn.commit()
     conn.close()
     return new_count
 
-def get_all_play_counts():
-    """Get all play counts as a dictionary"""
+def get_all_play_counts(username: str):
+    """Get all of a user's play counts as a dictionary"""
     init_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("SELECT release_id, play_count FROM play_counts")
+    cursor.execute("SELECT release_id, play_count FROM play_counts WHERE username = ?", (username,))
     rows = cursor.fetchall()
     conn.close()
     
     return {release_id: play_count for release_id, play_count in rows}
 
+def get_listening_stats(username: str, limit: int = 10, days: int = 30):
+    """A user's top records/artists/genres/labels, never-played records and plays per day"""
+    init_db()
+    conn = connect_db(DB_PATH)
+    stats = read_stats(conn.cursor(), username, limit, days)
+    conn.close()
+    return stats
+
 def cache_release(release_id: int, data: dict, tracks: list):
     """Save release data to cache"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT OR REPLACE INTO releases (release_id, data, tracks, fetched_at)
-        VALUES (?, ?, ?, ?)
-    """, (release_id, json.dumps(data), json.dumps(tracks), int(time.time())))
-    
+    store_release(cursor, release_id, data, tracks, int(time.time()))
     conn.commit()
     conn.close()
 
+def set_collection_releases(username: str, release_ids: list):
+    """Record which releases make up a user's synced collection (in Discogs order)"""
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM collection_releases WHERE username = ?", (username,))
+    cursor.executemany(
+        "INSERT OR IGNORE INTO collection_releases (username, release_id, position) VALUES (?, ?, ?)",
+        [(username, release_id, position) for position, release_id in enumerate(release_ids)],
+    )
+    conn.commit()
+    conn.close()
+
+# Release id -> lock held while that release is being fetched, so users syncing
+# in parallel fetch a record they both own only once
+_release_fetches = {}
+_release_fetches_lock = threading.Lock()
+
+def fetch_and_cache_release(release_id: int, basic: dict, token: str):
+    """
+    Fetch a release's tracklist (within the shared rate limit) and cache it,
+    unless a parallel sync has just done so. Returns (tracks, fetched).
+    """
+    with _release_fetches_lock:
+        lock = _release_fetches.setdefault(release_id, threading.Lock())
+    with lock:
+        try:
+            conn = connect_db(DB_PATH)
+            cached_tracks = [row[0] for row in conn.execute(
+                "SELECT title FROM tracks WHERE release_id = ? ORDER BY position", (release_id,))]
+            conn.close()
+            if cached_tracks:
+                return cached_tracks, False
+            DISCOGS_RATE.acquire()  # Rate limiting
+            tracks = get_release_tracks(release_id, token)
+            cache_release(release_id, basic, tracks)
+            return tracks, True
+        finally:
+            with _release_fetches_lock:
+                _release_fetches.pop(release_id, None)
+
 def get_collection(username: str, token: str, force_refresh: bool = False):
     """Fetch collection with smart caching - only fetches details if collection changed"""
     init_db()
@@ -278,25 +672,25 @@ def get_collection(username: str, token: str, force_refresh: bool = False):
     # Get cached collection metadata
     row = None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect_db(DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("SELECT last_updated, collection_count, release_ids_hash FROM collection_cache WHERE id = 1")
+        cursor.execute("SELECT last_updated, collection_count, release_ids_hash FROM collection_cache WHERE username = ?", (username,))
         row = cursor.fetchone()
         conn.close()
     except (sqlite3.OperationalError, sqlite3.DatabaseError) as e:
         # Table might not exist or database is corrupted, recreate it
-        print(f"Database error: {e}. Reinitializing database...")
+        logger.error("Database error: %s. Reinitializing database...", e)
         try:
             conn.close()
         except:
             pass
         # Force recreate the table
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect_db(DB_PATH)
         cursor = conn.cursor()
         cursor.execute("DROP TABLE IF EXISTS collection_cache")
         cursor.execute("""
             CREATE TABLE collection_cache (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
+                username TEXT PRIMARY KEY,
                 last_updated INTEGER NOT NULL,
                 collection_count INTEGER,
                 release_ids_hash TEXT
@@ -305,9 +699,9 @@ def get_collection(username: str, token: str, force_refresh: bool = False):
         conn.commit()
         conn.close()
         # Retry the query
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect_db(DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("SELECT last_updated, collection_count, release_ids_hash FROM collection_cache WHERE id = 1")
+        cursor.execute("SELECT last_updated, collection_count, release_ids_hash FROM collection_cache WHERE username = ?", (username,))
         row = cursor.fetchone()
         conn.close()
     
@@ -316,7 +710,7 @@ def get_collection(username: str, token: str, force_refresh: bool = False):
     cached_hash = row[2] if row and row[2] else None
     
     # Always fetch collection list (lightweight, just IDs and basic info)
-    print("Fetching collection list from Discogs...")
+    logger.info("Fetching collection list from Discogs...")
     collection = fetch_collection_from_api(username, token)
     
     # Calculate current collection hash (sorted release IDs)
@@ -337,17 +731,26 @@ def get_collection(username: str, token: str, force_refresh: bool = False):
     )
     
     if collection_changed:
-        print(f"Collection changed detected (count: {cached_count} -> {current_count})")
-        print("Fetching track details for all releases...")
+        logger.info("Collection change detected (count: %s -> %s), fetching track details", cached_count, current_count)
     else:
-        print(f"Collection unchanged (count: {current_count}), using cached track data")
+        logger.debug("Collection unchanged (count: %s), using cached track data", current_count)
     
-    # Get cached release IDs to identify new ones
-    conn = sqlite3.connect(DB_PATH)
+    # Record membership up front so SQL filters/sorts see the current collection
+    set_collection_releases(username, [
+        item.get("basic_information", {}).get("id")
+        for item in collection
+        if item.get("basic_information", {}).get("id")
+    ])
+
+    # Get cached release IDs to identify new ones (the release cache is shared by all users)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("SELECT release_id FROM releases")
     cached_release_ids = {row[0] for row in cursor.fetchall()}
     conn.close()
+
+    # Load every cached tracklist in one query instead of one lookup per release
+    all_cached_tracks = get_cached_tracks()
     
     # Enrich with track data from cache or API
     new_releases_count = 0
@@ -359,45 +762,43 @@ def get_collection(username: str, token: str, force_refresh: bool = False):
         is_new_release = release_id not in cached_release_ids
         
         # Try to get from cache first
-        cached_data, cached_tracks = get_cached_release(release_id)
+        cached_tracks = all_cached_tracks.get(release_id)
+        record_cache_lookup("release", bool(cached_tracks))
         
         if cached_tracks:
             # Use cached tracks
             item["tracks"] = cached_tracks
         elif collection_changed and is_new_release:
             # New release and collection changed - fetch tracks
-            print(f"Fetching tracks for new release: {item.get('basic_information', {}).get('title')}")
-            tracks = get_release_tracks(release_id, token)
+            logger.debug("Fetching tracks for new release", extra={"release_id": release_id})
+            tracks, fetched = fetch_and_cache_release(release_id, item.get("basic_information", {}), token)
             item["tracks"] = tracks
-            cache_release(release_id, item.get("basic_information", {}), tracks)
-            new_releases_count += 1
-            time.sleep(0.6)  # Rate limiting
+            new_releases_count += fetched
         elif not collection_changed:
             # Collection unchanged - should have cache, but if not, skip API call
             # (This shouldn't happen, but handle gracefully)
             if not cached_tracks:
-                print(f"Warning: No cache for {item.get('basic_information', {}).get('title')} but collection unchanged. Skipping API call.")
+                logger.warning("No cached tracks but collection unchanged, skipping API call", extra={"release_id": release_id})
                 item["tracks"] = []  # Empty tracks rather than fetching
         else:
             # Collection changed but release exists - should have cache, fetch if missing
-            print(f"Warning: No cache for existing release {item.get('basic_information', {}).get('title')}, fetching...")
-            tracks = get_release_tracks(release_id, token)
-            item["tracks"] = tracks
-            cache_release(release_id, item.get("basic_information", {}), tracks)
-            time.sleep(0.6)
+            logger.warning("No cached tracks for existing release, fetching", extra={"release_id": release_id})
+            item["tracks"], _ = fetch_and_cache_release(release_id, item.get("basic_information", {}), token)
     
     # Update cache metadata
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     cursor.execute("""
-        INSERT OR REPLACE INTO collection_cache (id, last_updated, collection_count, release_ids_hash)
-        VALUES (1, ?, ?, ?)
-    """, (now, current_count, current_hash))
+        INSERT OR REPLACE INTO collection_cache (username, last_updated, collection_count, release_ids_hash)
+        VALUES (?, ?, ?, ?)
+    """, (username, now, current_count, current_hash))
+    # Membership may have changed - recompute the listening stats summaries
+    rebuild_stats(cursor, username)
     conn.commit()
     conn.close()
     
     if collection_changed:
-        print(f"Collection cache updated. Fetched {new_releases_count} new release(s) from API.")
+        logger.info("Collection cache updated. Fetched %d new release(s) from API.", new_releases_count)
     
     return collection
 
@@ -409,7 +810,8 @@ def fetch_collection_from_api(username: str, token: str):
 
     all_items = []
     while True:
-        r = requests.get(url, headers=headers, params=params)
+        DISCOGS_RATE.acquire()
+        r = upstream_get(DISCOGS_BREAKER, url, timeout=15, headers=headers, params=params)
         r.raise_for_status()
         data = r.json()
         all_items.extend(data.get("releases", []))
@@ -421,19 +823,77 @@ def fetch_collection_from_api(username: str, token: str):
     
     return all_items
 
-def get_release_tracks(release_id: int, token: str):
-    """Fetch detailed release info including tracklist"""
+def fetch_release(release_id: int, token: str):
+    """Fetch the full Discogs release resource (raises on any failure)"""
     url = f"{API_BASE}/releases/{release_id}"
     headers = {"User-Agent": "VinylPi/1.0"}
     params = {"token": token}
-    
+
     try:
-        r = requests.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        data = r.json()
-        
+        r = upstream_get(DISCOGS_BREAKER, url, headers=headers, params=params)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        raise UpstreamUnavailable("discogs", str(e))
+    r.raise_for_status()
+    return r.json()
+
+def get_release_tracks(release_id: int, token: str):
+    """Fetch detailed release info including tracklist"""
+    try:
+        data = fetch_release(release_id, token)
         tracklist = data.get("tracklist", [])
         return [track.get("title", "") for track in tracklist]
+    except UpstreamUnavailable:
+        # Don't cache an empty tracklist just because Discogs is down
+        raise
     except Exception as e:
-        print(f"Error fetching tracks for release {release_id}: {e}")
-        return []
\ No newline at end of file
+        logger.warning("Error fetching tracks for release %s: %s", release_id, e)
+        return []
+
+# Fields of the release resource that replace the cached basic_information on refresh
+_REFRESH_FIELDS = ("master_id", "title", "year", "thumb", "artists", "labels", "formats", "genres", "styles")
+
+def refresh_release(release_id: int, token: str):
+    """Re-fetch a cached release from Discogs and store its current details and tracklist"""
+    data = fetch_release(release_id, token)
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    items = load_releases(cursor, [release_id])
+    basic = items[0]["basic_information"] if items else {"id": release_id}
+    basic.update({field: data[field] for field in _REFRESH_FIELDS if field in data})
+    tracks = [track.get("title", "") for track in data.get("tracklist", [])]
+    store_release(cursor, release_id, basic, tracks, int(time.time()))
+    # The artist/label/tag links may have changed; re-sum the stats of everyone who owns it
+    cursor.execute("SELECT username FROM collection_releases WHERE release_id = ?", (release_id,))
+    for (username,) in cursor.fetchall():
+        rebuild_stats(cursor, username)
+    conn.commit()
+    conn.close()
+
+def touch_release(release_id: int):
+    """Mark a cached release as fetched now without changing it (e.g. gone from Discogs)"""
+    conn = connect_db(DB_PATH)
+    conn.execute("UPDATE releases SET fetched_at = ? WHERE release_id = ?", (int(time.time()), release_id))
+    conn.commit()
+    conn.close()
+
+def get_stale_release_ids(max_age_seconds: float, frequent_plays: int, limit: int = 1):
+    """
+    Releases in anyone's collection fetched more than max_age_seconds ago,
+    most urgent first: records now playing, then records someone played at
+    least `frequent_plays` times, then everything else; oldest first within each.
+    """
+    init_db()
+    conn = connect_db(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.release_id FROM releases r
+        WHERE r.fetched_at < ? AND r.release_id IN (SELECT release_id FROM collection_releases)
+        ORDER BY
+            r.release_id IN (SELECT release_id FROM now_playing WHERE release_id IS NOT NULL) DESC,
+            COALESCE((SELECT MAX(p.play_count) FROM play_counts p WHERE p.release_id = r.release_id), 0) >= ? DESC,
+            r.fetched_at
+        LIMIT ?
+    """, (int(time.time() - max_age_seconds), frequent_plays, limit))
+    release_ids = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return release_ids
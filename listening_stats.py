@@ -0,0 +1,266 @@
+"""
+Listening statistics kept in summary tables, so /api/stats reads a handful of
+small indexed rows instead of aggregating play counts over the collection.
+
+- apply_play_change() runs in the same transaction as each play count update
+  and adjusts the totals, the per-artist/-tag/-label play sums, the unplayed
+  list and the plays-per-day histogram by the size of the change.
+- rebuild_stats() recomputes everything except the daily history from
+  play_counts and the release tables; it runs at the end of each sync (when
+  collection membership can change) and when the tables are first created.
+
+Stats are kept per user and cover that user's synced collection
+(collection_releases). All functions take a cursor; discogs_api owns the
+connections.
+"""
+import time
+
+STATS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        username TEXT PRIMARY KEY,
+        plays INTEGER NOT NULL,
+        records INTEGER NOT NULL,
+        played_records INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stats_artist_plays (
+        username TEXT NOT NULL,
+        artist_id INTEGER NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (username, artist_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_stats_artist_plays ON stats_artist_plays (username, plays);
+    CREATE TABLE IF NOT EXISTS stats_tag_plays (
+        username TEXT NOT NULL,
+        tag_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (username, tag_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_stats_tag_plays ON stats_tag_plays (username, kind, plays);
+    CREATE TABLE IF NOT EXISTS stats_label_plays (
+        username TEXT NOT NULL,
+        label_id INTEGER NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (username, label_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_stats_label_plays ON stats_label_plays (username, plays);
+    -- Collection records with no plays
+    CREATE TABLE IF NOT EXISTS stats_unplayed (
+        username TEXT NOT NULL,
+        release_id INTEGER NOT NULL,
+        PRIMARY KEY (username, release_id)
+    );
+    -- Plays per local day (YYYY-MM-DD); only ever built up incrementally
+    CREATE TABLE IF NOT EXISTS stats_daily_plays (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        plays INTEGER NOT NULL,
+        PRIMARY KEY (username, day)
+    );
+    CREATE INDEX IF NOT EXISTS idx_play_counts_user_count ON play_counts (username, play_count);
+"""
+
+# (summary table, key column, release link table) for the per-artist/-label play sums
+_DIMENSIONS = (
+    ("stats_artist_plays", "artist_id", "release_artists"),
+    ("stats_label_plays", "label_id", "release_labels"),
+)
+
+
+_SUMMARY_TABLES = ("stats_totals", "stats_artist_plays", "stats_tag_plays", "stats_label_plays", "stats_unplayed")
+
+
+def create_stats_tables(cursor, owner: str):
+    """
+    Create the summary tables; returns True if they were new (and need a
+    rebuild). Single-user tables are dropped, except the daily history, which
+    can't be rebuilt and goes to `owner`.
+    """
+    cursor.execute("PRAGMA table_info(stats_totals)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and "username" not in columns:
+        for table in _SUMMARY_TABLES:
+            cursor.execute(f"DROP TABLE {table}")
+        cursor.execute("ALTER TABLE stats_daily_plays RENAME TO stats_daily_plays_single_user")
+        cursor.executescript(STATS_SCHEMA)
+        cursor.execute("""
+            INSERT INTO stats_daily_plays (username, day, plays)
+            SELECT ?, day, plays FROM stats_daily_plays_single_user
+        """, (owner,))
+        cursor.execute("DROP TABLE stats_daily_plays_single_user")
+        return True
+    cursor.executescript(STATS_SCHEMA)
+    return not columns
+
+
+def _in_collection(cursor, username: str, release_id: int):
+    cursor.execute("SELECT 1 FROM collection_releases WHERE username = ? AND release_id = ?", (username, release_id))
+    return cursor.fetchone() is not None
+
+
+def apply_play_change(cursor, username: str, release_id: int, old_count: int, new_count: int, now: float = None):
+    """Fold one play count change into the user's summary tables"""
+    change = new_count - old_count
+    if change == 0:
+        return
+    now = time.time() if now is None else now
+
+    # Plays over time: a spin adds to today, an undo takes it back from today
+    day = time.strftime("%Y-%m-%d", time.localtime(now))
+    if change > 0:
+        cursor.execute("""
+            INSERT INTO stats_daily_plays (username, day, plays) VALUES (?, ?, ?)
+            ON CONFLICT (username, day) DO UPDATE SET plays = plays + excluded.plays
+        """, (username, day, change))
+    else:
+        cursor.execute("UPDATE stats_daily_plays SET plays = MAX(0, plays + ?) WHERE username = ? AND day = ?",
+                       (change, username, day))
+
+    if not _in_collection(cursor, username, release_id):
+        return
+
+    newly_played = old_count == 0 and new_count > 0
+    newly_unplayed = old_count > 0 and new_count == 0
+    cursor.execute("""
+        UPDATE stats_totals SET plays = plays + ?, played_records = played_records + ?, updated_at = ?
+        WHERE username = ?
+    """, (change, int(newly_played) - int(newly_unplayed), int(now), username))
+    if newly_played:
+        cursor.execute("DELETE FROM stats_unplayed WHERE username = ? AND release_id = ?", (username, release_id))
+    elif newly_unplayed:
+        cursor.execute("INSERT OR IGNORE INTO stats_unplayed (username, release_id) VALUES (?, ?)", (username, release_id))
+
+    for table, key, link in _DIMENSIONS:
+        cursor.execute(f"""
+            INSERT INTO {table} (username, {key}, plays)
+            SELECT DISTINCT ?, {key}, ? FROM {link} WHERE release_id = ?
+            ON CONFLICT (username, {key}) DO UPDATE SET plays = plays + excluded.plays
+        """, (username, change, release_id))
+    cursor.execute("""
+        INSERT INTO stats_tag_plays (username, tag_id, kind, plays)
+        SELECT ?, x.tag_id, t.kind, ? FROM release_tags x JOIN tags t USING (tag_id) WHERE x.release_id = ?
+        ON CONFLICT (username, tag_id) DO UPDATE SET plays = plays + excluded.plays
+    """, (username, change, release_id))
+    if change < 0:
+        # Drop the rows an undo brought back to zero, as rebuild_stats() would
+        for table, key, link in _DIMENSIONS + (("stats_tag_plays", "tag_id", "release_tags"),):
+            cursor.execute(f"""
+                DELETE FROM {table}
+                WHERE username = ? AND plays <= 0 AND {key} IN (SELECT {key} FROM {link} WHERE release_id = ?)
+            """, (username, release_id))
+
+
+def rebuild_stats(cursor, username: str):
+    """Recompute a user's collection-wide summaries from play_counts (daily history is kept)"""
+    # The user's play counts joined to their collection, used by every summary below
+    collection_plays = """
+        SELECT c.release_id, COALESCE(p.play_count, 0) AS play_count
+        FROM collection_releases c
+        LEFT JOIN play_counts p ON p.username = c.username AND p.release_id = c.release_id
+        WHERE c.username = :username
+    """
+    params = {"username": username, "now": int(time.time())}
+
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO stats_totals (username, plays, records, played_records, updated_at)
+        SELECT :username, COALESCE(SUM(play_count), 0), COUNT(*), COUNT(NULLIF(play_count, 0)), :now
+        FROM ({collection_plays})
+    """, params)
+
+    cursor.execute("DELETE FROM stats_unplayed WHERE username = ?", (username,))
+    cursor.execute(f"""
+        INSERT INTO stats_unplayed (username, release_id)
+        SELECT :username, release_id FROM ({collection_plays}) WHERE play_count = 0
+    """, params)
+
+    for table, key, link in _DIMENSIONS:
+        cursor.execute(f"DELETE FROM {table} WHERE username = ?", (username,))
+        cursor.execute(f"""
+            INSERT INTO {table} (username, {key}, plays)
+            SELECT :username, x.{key}, SUM(p.play_count)
+            FROM (SELECT DISTINCT release_id, {key} FROM {link}) x
+            JOIN ({collection_plays}) p USING (release_id)
+            WHERE p.play_count > 0
+            GROUP BY x.{key}
+        """, params)
+    cursor.execute("DELETE FROM stats_tag_plays WHERE username = ?", (username,))
+    cursor.execute(f"""
+        INSERT INTO stats_tag_plays (username, tag_id, kind, plays)
+        SELECT :username, x.tag_id, t.kind, SUM(p.play_count)
+        FROM release_tags x JOIN tags t USING (tag_id)
+        JOIN ({collection_plays}) p USING (release_id)
+        WHERE p.play_count > 0
+        GROUP BY x.tag_id
+    """, params)
+
+
+def _release_rows(cursor, release_ids):
+    if not release_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in release_ids)
+    cursor.execute(f"SELECT release_id, title, artist_display FROM releases WHERE release_id IN ({placeholders})",
+                   tuple(release_ids))
+    return {release_id: {"release_id": release_id, "title": title, "artist": artist}
+            for release_id, title, artist in cursor.fetchall()}
+
+
+def read_stats(cursor, username: str, limit: int = 10, days: int = 30):
+    """A user's /api/stats payload; every query reads at most `limit` (or `days`) index entries"""
+    cursor.execute("SELECT plays, records, played_records, updated_at FROM stats_totals WHERE username = ?", (username,))
+    plays, records, played_records, updated_at = cursor.fetchone() or (0, 0, 0, None)
+
+    cursor.execute("""
+        SELECT p.release_id, p.play_count FROM play_counts p
+        WHERE p.username = ? AND p.play_count > 0
+          AND p.release_id IN (SELECT release_id FROM collection_releases WHERE username = ?)
+        ORDER BY p.play_count DESC LIMIT ?
+    """, (username, username, limit))
+    top = cursor.fetchall()
+    releases = _release_rows(cursor, [release_id for release_id, _ in top])
+    top_records = [{**releases.get(release_id, {"release_id": release_id}), "plays": count} for release_id, count in top]
+
+    def top_names(query, *params):
+        cursor.execute(query, (username, *params, limit))
+        return [{"name": name, "plays": count} for name, count in cursor.fetchall()]
+
+    top_artists = top_names("""
+        SELECT a.name, s.plays FROM stats_artist_plays s JOIN artists a USING (artist_id)
+        WHERE s.username = ? AND s.plays > 0 ORDER BY s.plays DESC LIMIT ?
+    """)
+    top_labels = top_names("""
+        SELECT l.name, s.plays FROM stats_label_plays s JOIN labels l USING (label_id)
+        WHERE s.username = ? AND s.plays > 0 ORDER BY s.plays DESC LIMIT ?
+    """)
+    tag_query = """
+        SELECT t.name, s.plays FROM stats_tag_plays s JOIN tags t USING (tag_id)
+        WHERE s.username = ? AND s.kind = ? AND s.plays > 0 ORDER BY s.plays DESC LIMIT ?
+    """
+    top_genres = top_names(tag_query, "genre")
+    top_styles = top_names(tag_query, "style")
+
+    cursor.execute("SELECT release_id FROM stats_unplayed WHERE username = ? LIMIT ?", (username, limit))
+    unplayed_ids = [row[0] for row in cursor.fetchall()]
+    releases = _release_rows(cursor, unplayed_ids)
+    never_played = [releases.get(release_id, {"release_id": release_id}) for release_id in unplayed_ids]
+
+    since = time.strftime("%Y-%m-%d", time.localtime(time.time() - (days - 1) * 86400))
+    cursor.execute("SELECT day, plays FROM stats_daily_plays WHERE username = ? AND day >= ? ORDER BY day", (username, since))
+    plays_by_day = [{"day": day, "plays": count} for day, count in cursor.fetchall()]
+
+    return {
+        "totals": {
+            "plays": plays,
+            "records": records,
+            "played_records": played_records,
+            "never_played": records - played_records,
+            "updated_at": updated_at,
+        },
+        "top_records": top_records,
+        "top_artists": top_artists,
+        "top_genres": top_genres,
+        "top_styles": top_styles,
+        "top_labels": top_labels,
+        "never_played": never_played,
+        "plays_by_day": plays_by_day,
+    }
@@ -0,0 +1,140 @@
+"""
+Logging configuration for the app.
+
+- Every module logs through its own logger (logging.getLogger(__name__)).
+- Handlers run on a background thread: the request path only puts records on
+  an in-memory queue (QueueHandler/QueueListener), so journal writes never
+  block a request or a sync.
+- Repetitive messages are sampled: after LOG_SAMPLE_BURST records with the
+  same message template in LOG_SAMPLE_WINDOW seconds, only every
+  LOG_SAMPLE_EVERY-th one is kept (errors and HTTP access lines are never
+  sampled: every access line shares one template but is its own event).
+- LOG_FORMAT=json emits one JSON object per line; fields passed with
+  extra={...} are included as structured keys (appended as key=value in text).
+
+LOG_LEVEL defaults to INFO, where per-release and per-search-hit messages
+(DEBUG) are skipped before any formatting happens.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", 10))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", 60))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 100))
+
+# Access loggers: one line per request, all with the same template
+_UNSAMPLED_LOGGERS = ("werkzeug", "gunicorn.access")
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+def _extra_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+    """Classic one-line format with structured fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v!r}" if isinstance(v, str) and " " in v else f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let a burst of each message template through, then keep 1 in `every` per window"""
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.every = max(1, every)
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        if any(record.name == name or record.name.startswith(name + ".") for name in _UNSAMPLED_LOGGERS):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count = self._seen.get(key, (now, 0))
+            if now - window_start > self.window:
+                window_start, count = now, 0
+            count += 1
+            self._seen[key] = (window_start, count)
+        if count <= self.burst:
+            return True
+        if (count - self.burst) % self.every == 0:
+            record.sampled = self.every  # This record stands in for `every` similar ones
+            return True
+        return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve the message now (args may change later) but leave formatting to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """Install the queue-based handlers on the root logger (safe to call more than once)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,16 +1,41 @@
-import sqlite3
 import time
 import json
+import logging
 import requests
 from bs4 import BeautifulSoup
+import os
 import re
+import threading
+import unicodedata
 import urllib.parse
 
+import lyrics_pipeline
+from admission import LYRICS_FETCHES
+from resilience import GENIUS_BREAKER, UpstreamUnavailable, raise_for_transient, upstream_get
+from metrics import connect as connect_db, record_cache_lookup
+
 DB_PATH = "vinyl_collection.db"
+GENIUS_BASE = os.getenv("GENIUS_BASE", "https://genius.com")
+
+logger = logging.getLogger(__name__)
+
+# Database paths whose lyrics table has already been created/migrated by this process
+_initialized_dbs = set()
+_init_lock = threading.Lock()
 
 def init_lyrics_db():
-    """Ensure lyrics table exists"""
-    conn = sqlite3.connect(DB_PATH)
+    """Create and migrate the lyrics table, once per database and process"""
+    if DB_PATH in _initialized_dbs:
+        return
+    # Lyrics fetches from several threads may be the first to get here
+    with _init_lock:
+        if DB_PATH not in _initialized_dbs:
+            _create_lyrics_table()
+            _initialized_dbs.add(DB_PATH)
+
+def _create_lyrics_table():
+    """Ensure lyrics table exists (and has the normalized cache_key column)"""
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -20,35 +45,121 @@ def init_lyrics_db():
             track_name TEXT NOT NULL,
             lyrics TEXT NOT NULL,
             fetched_at INTEGER NOT NULL,
+            cache_key TEXT,
             UNIQUE(artist, track_name)
         )
     """)
     
+    cursor.execute("PRAGMA table_info(lyrics)")
+    if "cache_key" not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE lyrics ADD COLUMN cache_key TEXT")
+    migrate_cache_keys(cursor)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_lyrics_cache_key ON lyrics(cache_key)")
+    
     conn.commit()
     conn.close()
 
+def migrate_cache_keys(cursor):
+    """
+    Fill in cache_key for rows cached by older versions, merging rows that
+    turn out to be the same song (keeping found lyrics over "not found", then
+    the newest).
+    """
+    cursor.execute("SELECT id, artist, track_name, lyrics, fetched_at FROM lyrics WHERE cache_key IS NULL")
+    rows = cursor.fetchall()
+    if not rows:
+        return
+
+    cursor.execute("SELECT cache_key, id, lyrics, fetched_at FROM lyrics WHERE cache_key IS NOT NULL")
+    best = {key: (row_id, lyrics, fetched_at) for key, row_id, lyrics, fetched_at in cursor.fetchall()}
+    already_keyed = {row_id for row_id, _, _ in best.values()}
+    for row_id, artist, track_name, lyrics, fetched_at in rows:
+        key = cache_key(artist, track_name)
+        current = best.get(key)
+        if current is None or (bool(lyrics), fetched_at) > (bool(current[1]), current[2]):
+            best[key] = (row_id, lyrics, fetched_at)
+
+    keep = {row_id: key for key, (row_id, _, _) in best.items()}
+    losers = [(row_id,) for row_id in already_keyed | {row[0] for row in rows} if row_id not in keep]
+    cursor.executemany("DELETE FROM lyrics WHERE id = ?", losers)
+    cursor.executemany("UPDATE lyrics SET cache_key = ? WHERE id = ? AND cache_key IS NULL",
+                       [(key, row_id) for row_id, key in keep.items()])
+    logger.info("Normalized %d cached lyrics row(s), merged %d duplicate(s)", len(rows), len(losers))
+
 def clean_artist_name(artist: str):
     """Clean artist name by removing Discogs disambiguation like (2), (3), etc."""
-    # Remove patterns like "(2)", "(3)", etc. at the end
-    artist = re.sub(r'\s*\(\d+\)\s*$', '', artist).strip()
-    # Also handle cases where it might be in the middle or start
-    artist = re.sub(r'^\s*\(\d+\)\s*', '', artist).strip()
+    previous = None
+    while artist != previous:
+        previous = artist
+        # Remove patterns like "(2)", "(3)", etc. at the end
+        artist = re.sub(r'\s*\(\d+\)\s*$', '', artist).strip()
+        # Also handle cases where it might be in the middle or start
+        artist = re.sub(r'^\s*\(\d+\)\s*', '', artist).strip()
     return artist
 
+# Version/credit noise at the end of a title that doesn't change which song's
+# lyrics we want, e.g. "(Remastered 2011)", "- 2009 Remaster", "[Live]",
+# "(feat. X)", "ft. X". Leading parentheticals are part of the title:
+# "(I Can't Live) Without You" is not "Without You".
+_SUFFIX_WORDS = r"remaster(?:ed)?|live|mono|stereo|version|edit|mix|demo|single|radio|bonus|acoustic|instrumental|take"
+_BRACKETED_NOISE = re.compile(r"\s*[(\[][^)\]]*\b(?:" + _SUFFIX_WORDS + r"|feat\.?|ft\.?|featuring|with)\b[^)\]]*[)\]]\s*$", re.IGNORECASE)
+_DASH_NOISE = re.compile(r"\s+-\s+[^-]*\b(?:" + _SUFFIX_WORDS + r")\b.*$", re.IGNORECASE)
+_FEATURING = re.compile(r"\s+(?:feat\.?|ft\.|featuring)\s+.*$", re.IGNORECASE)
+_APOSTROPHES = re.compile(r"['\u2018\u2019\u02bc`\u00b4]")
+_PUNCTUATION = re.compile(r"[\W_]+")
+_LEADING_ARTICLE = re.compile(r"^the\s+", re.IGNORECASE)
+
+def clean_track_name(track_name: str):
+    """Track title without version/remaster/featuring suffixes, for searching and display"""
+    # One suffix at a time until none is left, so "Song (Live) - Remastered" loses
+    # both and cleaning an already clean name changes nothing
+    track, previous = track_name, None
+    while track != previous:
+        previous = track
+        track = _BRACKETED_NOISE.sub("", track)
+        track = _DASH_NOISE.sub("", track)
+        track = _FEATURING.sub("", track).strip()
+    return track or track_name.strip()
+
+def clean_names(artist: str, track_name: str):
+    """
+    Artist and track as sent to the Genius search and stored in the cache.
+    NFKC first so full-width "（２）" disambiguation and brackets are recognized.
+    """
+    return (clean_artist_name(unicodedata.normalize("NFKC", artist)),
+            clean_track_name(unicodedata.normalize("NFKC", track_name)))
+
+def _normalize(text: str):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _APOSTROPHES.sub("", text)
+    text = text.replace("&", " and ")
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+def _key_part(text: str):
+    """Normalized name; all-punctuation names ("!!!", "?") keep their punctuation rather than all becoming empty"""
+    return _normalize(text) or " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def cache_key(artist: str, track_name: str):
+    """
+    Canonical key lyrics are cached under: case, Unicode form, punctuation and
+    version/featuring suffixes don't matter ("AC/DC" == "Ac/Dc", curly == straight
+    apostrophes, "Song (Remastered 2011)" == "Song").
+    """
+    # Same names as get_lyrics() caches under, so raw and cleaned names give the same key
+    clean_artist, clean_track = clean_names(artist, track_name)
+    artist_key = _key_part(_LEADING_ARTICLE.sub("", clean_artist))
+    track_key = _key_part(clean_track)
+    if artist_key.startswith("the "):
+        artist_key = artist_key[4:]
+    return f"{artist_key}\t{track_key}"
+
 def get_cached_lyrics(artist: str, track_name: str):
     """Get lyrics from cache if available"""
     init_lyrics_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
-    # Clean artist name for cache lookup too
-    clean_artist = clean_artist_name(artist)
-    clean_track = track_name.split("(")[0].split("-")[0].strip()
-    
-    cursor.execute(
-        "SELECT lyrics FROM lyrics WHERE artist = ? AND track_name = ?",
-        (clean_artist, clean_track)
-    )
+    cursor.execute("SELECT lyrics FROM lyrics WHERE cache_key = ?", (cache_key(artist, track_name),))
     row = cursor.fetchone()
     conn.close()
     
@@ -57,145 +168,142 @@ def get_cached_lyrics(artist: str, track_name: str):
 def cache_lyrics(artist: str, track_name: str, lyrics: str):
     """Cache lyrics in database"""
     init_lyrics_db()
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db(DB_PATH)
     cursor = conn.cursor()
     
     # Clean artist name and track name for consistent caching
-    clean_artist = clean_artist_name(artist)
-    clean_track = track_name.split("(")[0].split("-")[0].strip()
+    clean_artist, clean_track = clean_names(artist, track_name)
     
     cursor.execute("""
-        INSERT OR REPLACE INTO lyrics (artist, track_name, lyrics, fetched_at)
-        VALUES (?, ?, ?, ?)
-    """, (clean_artist, clean_track, lyrics, int(time.time())))
+        INSERT OR REPLACE INTO lyrics (artist, track_name, lyrics, fetched_at, cache_key)
+        VALUES (?, ?, ?, ?, ?)
+    """, (clean_artist, clean_track, lyrics, int(time.time()), cache_key(artist, track_name)))
     
     conn.commit()
     conn.close()
 
+SEARCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "application/json"
+}
+PAGE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+def genius_search_url(query: str):
+    # Use Genius public API endpoint (no authentication required)
+    return f"{GENIUS_BASE}/api/search/multi?q={urllib.parse.quote(query)}"
+
+def _hit_url(result):
+    song_url = result.get("url")
+    if not song_url and result.get("path"):
+        song_url = f"{GENIUS_BASE}{result['path']}"
+    return song_url
+
+def pick_song_url(data, artist: str = None):
+    """
+    The song URL from a Genius search response, or None.
+
+    Without `artist` the first song hit wins (artist + track query). With it,
+    only hits whose primary artist matches are accepted (track-only query).
+    """
+    if "response" not in data:
+        logger.warning("No 'response' key in Genius API data. Keys: %s", list(data.keys()))
+        return None
+    if "sections" not in data["response"]:
+        logger.warning("No 'sections' key in Genius response. Keys: %s", list(data["response"].keys()))
+        return None
+    
+    # Parse API response - look for song results
+    sections = data["response"]["sections"]
+    logger.debug("Found %d sections in response", len(sections))
+    
+    for section in sections:
+        if section.get("type") != "song":
+            continue
+        hits = section.get("hits", [])
+        logger.debug("Found %d song hits", len(hits))
+        
+        for hit in hits:
+            result = hit.get("result", {})
+            logger.debug("Hit result type: %s, title: %s", result.get("type"), result.get("title", "N/A"))
+            
+            if artist:
+                # Check if artist name matches (case-insensitive)
+                primary_artist = result.get("primary_artist", {})
+                artist_name = primary_artist.get("name", "").lower() if primary_artist else ""
+                logger.debug("Comparing: '%s' with '%s'", artist.lower(), artist_name)
+                if not (artist.lower() in artist_name or artist_name in artist.lower() or not artist_name):
+                    continue
+            
+            song_url = _hit_url(result)
+            if song_url:
+                logger.debug("Found song URL: %s", song_url)
+                return song_url
+            logger.debug("No URL found. Result keys: %s", list(result.keys()))
+    return None
+
 def search_genius_song(artist: str, track_name: str):
     """Search for a song on Genius using their public API and return the song URL"""
     try:
-        # Clean up artist name (remove Discogs disambiguation)
-        clean_artist = clean_artist_name(artist)
-        # Clean up track name (remove common suffixes like "Remastered", etc.)
-        clean_track = track_name.split("(")[0].split("-")[0].strip()
+        # Remove Discogs disambiguation and suffixes like "Remastered"
+        clean_artist, clean_track = clean_names(artist, track_name)
         
         # Build search query - try with artist first for better matching
         query = f"{clean_artist} {clean_track}"
-        print(f"Searching Genius API with query: {query}")
+        logger.debug("Searching Genius API with query: %s", query)
         
-        # Use Genius public API endpoint (no authentication required)
-        search_url = f"https://genius.com/api/search/multi?q={urllib.parse.quote(query)}"
-        
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Accept": "application/json"
-        }
-        
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = upstream_get(GENIUS_BREAKER, genius_search_url(query), headers=SEARCH_HEADERS, timeout=10)
+        raise_for_transient(GENIUS_BREAKER, response)
         response.raise_for_status()
-        data = response.json()
-        
-        print(f"Genius API response status: {response.status_code}")
-        
-        # Debug: Print response structure to understand what we're getting
-        if "response" not in data:
-            print(f"Warning: No 'response' key in API data. Keys: {list(data.keys())}")
-            return None
-        
-        if "sections" not in data["response"]:
-            print(f"Warning: No 'sections' key in response. Keys: {list(data['response'].keys())}")
-            return None
-        
-        # Parse API response - look for song results
-        sections = data["response"]["sections"]
-        print(f"Found {len(sections)} sections in response")
-        
-        for section in sections:
-            section_type = section.get("type")
-            print(f"Section type: {section_type}")
-            
-            if section_type == "song":
-                hits = section.get("hits", [])
-                print(f"Found {len(hits)} song hits")
-                
-                # Return the first matching song result
-                # Since we're already in a "song" section, all hits should be songs
-                for hit in hits:
-                    result = hit.get("result", {})
-                    result_type = result.get("type")
-                    title = result.get("title", "N/A")
-                    print(f"Hit result type: {result_type}, title: {title}")
-                    
-                    # Check if it's a song (either type is "song" or we're in song section)
-                    # Also check for URL directly since we're in song section
-                    song_url = result.get("url")
-                    if song_url:
-                        print(f"Found song URL: {song_url}")
-                        return song_url
-                    else:
-                        # Debug: show what keys we have
-                        print(f"No URL found. Result keys: {list(result.keys())}")
-                        # Try alternative URL fields
-                        if "path" in result:
-                            path = result.get("path")
-                            if path:
-                                song_url = f"https://genius.com{path}"
-                                print(f"Found song URL via path: {song_url}")
-                                return song_url
+        song_url = pick_song_url(response.json())
+        if song_url:
+            return song_url
         
         # If no song found, try searching with just track name
         if clean_artist and clean_track:
-            print(f"Trying track-only search: {clean_track}")
-            query_track_only = clean_track
-            search_url = f"https://genius.com/api/search/multi?q={urllib.parse.quote(query_track_only)}"
-            response = requests.get(search_url, headers=headers, timeout=10)
+            logger.debug("Trying track-only search: %s", clean_track)
+            response = upstream_get(GENIUS_BREAKER, genius_search_url(clean_track), headers=SEARCH_HEADERS, timeout=10)
+            raise_for_transient(GENIUS_BREAKER, response)
             if response.status_code == 200:
-                data = response.json()
-                if "response" in data and "sections" in data["response"]:
-                    for section in data["response"]["sections"]:
-                        if section.get("type") == "song":
-                            hits = section.get("hits", [])
-                            print(f"Found {len(hits)} song hits in track-only search")
-                            for hit in hits:
-                                result = hit.get("result", {})
-                                # Check if artist name matches (case-insensitive)
-                                primary_artist = result.get("primary_artist", {})
-                                artist_name = primary_artist.get("name", "").lower() if primary_artist else ""
-                                print(f"Comparing: '{clean_artist.lower()}' with '{artist_name}'")
-                                
-                                # Check artist match or if no artist specified, take first result
-                                if not clean_artist or clean_artist.lower() in artist_name or artist_name in clean_artist.lower() or not artist_name:
-                                    song_url = result.get("url")
-                                    if not song_url and "path" in result:
-                                        path = result.get("path")
-                                        if path:
-                                            song_url = f"https://genius.com{path}"
-                                    
-                                    if song_url:
-                                        print(f"Found song via track-only search: {song_url}")
-                                        return song_url
+                song_url = pick_song_url(response.json(), artist=clean_artist)
+                if song_url:
+                    return song_url
         
-        print(f"No song URL found after all search attempts")
+        logger.debug("No song URL found after all search attempts")
         return None
+    except UpstreamUnavailable:
+        raise
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        # Genius is unreachable - propagate so the miss isn't cached as "not found"
+        raise UpstreamUnavailable("genius", str(e))
     except requests.exceptions.RequestException as e:
-        print(f"Network error searching Genius for {artist} - {track_name}: {e}")
+        logger.warning("Network error searching Genius for %s - %s: %s", artist, track_name, e)
         return None
     except Exception as e:
-        print(f"Error searching Genius for {artist} - {track_name}: {e}")
+        logger.warning("Error searching Genius for %s - %s: %s", artist, track_name, e)
         return None
 
 def scrape_lyrics_from_genius(song_url: str):
     """Scrape lyrics from a Genius song page"""
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        
-        response = requests.get(song_url, headers=headers, timeout=10)
+        response = upstream_get(GENIUS_BREAKER, song_url, headers=PAGE_HEADERS, timeout=10)
+        # A failing or throttling Genius isn't a page without lyrics
+        raise_for_transient(GENIUS_BREAKER, response)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+    except UpstreamUnavailable:
+        raise
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        raise UpstreamUnavailable("genius", str(e))
+    except Exception as e:
+        logger.warning("Error scraping lyrics from %s: %s", song_url, e)
+        return None
+    return extract_lyrics(response.text, song_url)
+
+def extract_lyrics(html: str, song_url: str = ""):
+    """Pull the lyrics text out of a Genius song page, or None"""
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
         
         # Method 1: Try to find lyrics in JSON-LD structured data
         scripts = soup.find_all('script', type='application/ld+json')
@@ -275,6 +383,10 @@ def scrape_lyrics_from_genius(song_url: str):
         # Extract lyrics text - focus on actual lyrics content
         lyrics_lines = []
         
+        # Language names from the translations menu (also used by the fallback below)
+        language_names = ['فارسی', 'bahasa indonesia', 'español', 'português', '繁體中文', 'traditional chinese',
+                        'česky', 'magyar', 'français', 'türkçe', 'deutsch', 'русский', 'russian']
+        
         # Find all div elements that are likely lyrics lines
         for element in lyrics_div.find_all(['div', 'p', 'span']):
             element_text = element.get_text(strip=True)
@@ -289,8 +401,6 @@ def scrape_lyrics_from_genius(song_url: str):
                 continue
             
             # Skip if it's just language names
-            language_names = ['فارسی', 'bahasa indonesia', 'español', 'português', '繁體中文', 'traditional chinese',
-                            'česky', 'magyar', 'français', 'türkçe', 'deutsch', 'русский', 'russian']
             if element_lower in [lang.lower() for lang in language_names] or \
                (len(element_text) < 30 and any(lang.lower() in element_lower for lang in language_names)):
                 continue
@@ -352,19 +462,19 @@ def scrape_lyrics_from_genius(song_url: str):
         # Final validation - make sure we have actual lyrics content
         # Lyrics should be substantial (at least 50 characters)
         if not lyrics_text or len(lyrics_text) < 50:
-            print(f"Lyrics too short after filtering: {len(lyrics_text) if lyrics_text else 0} characters")
+            logger.debug("Lyrics too short after filtering: %d characters", len(lyrics_text) if lyrics_text else 0)
             return None
         
         # Check if content is mostly navigation (too many unique short words suggests navigation)
         words = lyrics_text.split()
         if len(words) < 20:  # Too few words for real lyrics
-            print(f"Too few words for lyrics: {len(words)}")
+            logger.debug("Too few words for lyrics: %d", len(words))
             return None
         
         return lyrics_text
         
     except Exception as e:
-        print(f"Error scraping lyrics from {song_url}: {e}")
+        logger.warning("Error scraping lyrics from %s: %s", song_url, e)
         return None
 
 def get_lyrics(artist: str, track_name: str):
@@ -372,55 +482,64 @@ def get_lyrics(artist: str, track_name: str):
     Get lyrics from cache or fetch from Genius.
     Uses Genius public API for search, then scrapes lyrics page.
     """
-    # Clean up artist name (remove Discogs disambiguation)
-    clean_artist = clean_artist_name(artist)
-    # Clean up track name (remove common suffixes like "Remastered", etc.)
-    clean_track = track_name.split("(")[0].split("-")[0].strip()
+    clean_artist, clean_track = clean_names(artist, track_name)
     
-    print(f"Searching for lyrics: {clean_artist} - {clean_track}")
+    logger.debug("Searching for lyrics: %s - %s", clean_artist, clean_track)
     
     # Check cache first to avoid unnecessary API calls
     cached = get_cached_lyrics(clean_artist, clean_track)
+    record_cache_lookup("lyrics", cached is not None)
     if cached is not None:
         # Return cached lyrics (even if empty string, which means not found)
         if cached:
-            print(f"Found cached lyrics for {clean_artist} - {clean_track}")
+            logger.debug("Found cached lyrics for %s - %s", clean_artist, clean_track)
             return cached
         else:
-            print(f"Found cached 'not found' for {clean_artist} - {clean_track}")
+            logger.debug("Found cached 'not found' for %s - %s", clean_artist, clean_track)
             return None
     
+    # Cold fetches are CPU-heavy on the Pi (scrape + parse); only a few run at once
+    with LYRICS_FETCHES.slot():
+        # Another request may have fetched this track while we waited for a slot
+        cached = get_cached_lyrics(clean_artist, clean_track)
+        if cached is not None:
+            return cached or None
+        return fetch_lyrics(clean_artist, clean_track)
+
+
+def fetch_lyrics(clean_artist: str, clean_track: str, cache_misses: bool = True):
+    """
+    Search Genius and scrape the lyrics page, bypassing the cache lookup.
+    Found lyrics are cached; misses are cached as "" unless cache_misses is False.
+    """
     try:
-        # Step 1: Use Genius public API to search for the song
-        # (No authentication required for search)
-        song_url = search_genius_song(clean_artist, clean_track)
+        # Search Genius (both strategies concurrently) and scrape the song page
+        # (Genius API doesn't provide lyrics, only metadata, so we need to scrape)
+        song_url, lyrics_text = lyrics_pipeline.find_lyrics(clean_artist, clean_track)
         
         if not song_url:
-            print(f"No song URL found for {clean_artist} - {clean_track}")
+            logger.info("No song URL found for %s - %s", clean_artist, clean_track)
             # Cache empty result to avoid repeated failed lookups
-            cache_lyrics(clean_artist, clean_track, "")
+            if cache_misses:
+                cache_lyrics(clean_artist, clean_track, "")
             return None
         
-        print(f"Found song URL: {song_url}")
-        
-        # Step 2: Scrape lyrics from the song page
-        # (Genius API doesn't provide lyrics, only metadata, so we need to scrape)
-        lyrics_text = scrape_lyrics_from_genius(song_url)
-        
         if lyrics_text:
-            print(f"Successfully scraped lyrics for {clean_artist} - {clean_track}")
+            logger.info("Scraped lyrics for %s - %s", clean_artist, clean_track)
             # Cache the lyrics for future use
             cache_lyrics(clean_artist, clean_track, lyrics_text)
             return lyrics_text
         else:
-            print(f"Failed to scrape lyrics from {song_url}")
+            logger.info("Failed to scrape lyrics from %s", song_url)
             # Cache empty result to avoid repeated failed lookups
-            cache_lyrics(clean_artist, clean_track, "")
+            if cache_misses:
+                cache_lyrics(clean_artist, clean_track, "")
             return None
             
+    except UpstreamUnavailable:
+        # Genius is down or the request ran out of time - don't cache a miss
+        raise
     except Exception as e:
-        print(f"Error fetching lyrics for {clean_artist} - {clean_track}: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching lyrics for %s - %s: %s", clean_artist, clean_track, e)
         return None
 
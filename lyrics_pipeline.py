@@ -0,0 +1,208 @@
+"""
+Concurrent Genius search and scrape for uncached lyrics.
+
+find_lyrics() runs an asyncio pipeline on a shared background event loop and
+blocks the calling (Flask) thread until it finishes, so callers stay
+synchronous:
+
+- The artist + track search starts at once. If it hasn't come back with a hit
+  within LYRICS_HEDGE_SECONDS, the track-only search (which only accepts hits
+  by the same artist) starts alongside it. The first acceptable hit wins and
+  the other search is abandoned: it isn't sent if it hasn't started yet, and
+  its results aren't read if it has. A request already in flight can't be
+  aborted, though, so it still counts against Genius and its breaker.
+- The song page is streamed in chunks (capped at LYRICS_MAX_PAGE_BYTES) so a
+  cancelled fetch stops reading early.
+- HTML parsing runs in a small worker pool (LYRICS_PARSE_WORKERS), never on the
+  event loop.
+
+Upstream calls keep going through upstream_get(), so the Genius circuit breaker
+and the caller's request budget (passed explicitly as a deadline, since the
+loop runs on another thread) still apply. LYRICS_PIPELINE=sync switches back
+to the sequential search_genius_song() + scrape_lyrics_from_genius() path.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+import time
+
+import requests
+
+import lyrics_api
+from resilience import GENIUS_BREAKER, UpstreamUnavailable, raise_for_transient, remaining_budget, request_budget, upstream_get
+
+LYRICS_PIPELINE = os.getenv("LYRICS_PIPELINE", "async").lower()
+LYRICS_HEDGE_SECONDS = float(os.getenv("LYRICS_HEDGE_SECONDS", 0.3))
+LYRICS_PARSE_WORKERS = int(os.getenv("LYRICS_PARSE_WORKERS", 2))
+LYRICS_MAX_PAGE_BYTES = int(os.getenv("LYRICS_MAX_PAGE_BYTES", 2 * 1024 * 1024))
+
+logger = logging.getLogger(__name__)
+
+_io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="lyrics-io")
+_parse_pool = concurrent.futures.ThreadPoolExecutor(max_workers=LYRICS_PARSE_WORKERS, thread_name_prefix="lyrics-parse")
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    """The shared event loop, started on a daemon thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="lyrics-loop", daemon=True).start()
+        return _loop
+
+
+def _with_deadline(deadline, fn, *args):
+    """Run fn in a worker thread under the original request's budget"""
+    if deadline is None:
+        return fn(*args)
+    with request_budget(deadline - time.monotonic()):
+        return fn(*args)
+
+
+async def _run_blocking(pool, deadline, fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(_with_deadline, deadline, fn, *args))
+
+
+def _search(query: str, cancelled: threading.Event, artist: str = None):
+    """One Genius search; returns an acceptable song URL, or None (also if cancelled)"""
+    if cancelled.is_set():
+        return None
+    try:
+        response = upstream_get(GENIUS_BREAKER, lyrics_api.genius_search_url(query), headers=lyrics_api.SEARCH_HEADERS,
+                                timeout=10, stream=True)
+        try:
+            raise_for_transient(GENIUS_BREAKER, response)
+            if response.status_code != 200 or cancelled.is_set():
+                return None
+            return lyrics_api.pick_song_url(response.json(), artist=artist)
+        finally:
+            response.close()
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        raise UpstreamUnavailable("genius", str(e))
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("Error searching Genius for %s: %s", query, e)
+        return None
+
+
+def _download(song_url: str, cancelled: threading.Event):
+    """Stream a song page; returns the HTML, or None if cancelled/too large/failed"""
+    try:
+        response = upstream_get(GENIUS_BREAKER, song_url, headers=lyrics_api.PAGE_HEADERS, timeout=10, stream=True)
+        try:
+            # A failing or throttling Genius isn't a page without lyrics
+            raise_for_transient(GENIUS_BREAKER, response)
+            response.raise_for_status()
+            chunks, size = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                if cancelled.is_set():
+                    return None
+                size += len(chunk)
+                if size > LYRICS_MAX_PAGE_BYTES:
+                    logger.warning("Song page %s is larger than %d bytes, skipping", song_url, LYRICS_MAX_PAGE_BYTES)
+                    return None
+                chunks.append(chunk)
+            return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+        finally:
+            response.close()
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        raise UpstreamUnavailable("genius", str(e))
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("Error scraping lyrics from %s: %s", song_url, e)
+        return None
+
+
+async def find_song_url(clean_artist: str, clean_track: str, deadline=None):
+    """Run the two search strategies, hedged, and return the first acceptable song URL"""
+    # Set once a winner is found, so the other search stops wherever it has got to
+    cancelled = threading.Event()
+    searches = [asyncio.ensure_future(_run_blocking(_io_pool, deadline, _search, f"{clean_artist} {clean_track}", cancelled))]
+    pending = set(searches)
+    unavailable = None
+
+    def song_url(task):
+        """A finished search's URL, if any; an unreachable Genius is remembered, not taken for 'not found'"""
+        nonlocal unavailable
+        if isinstance(task.exception(), UpstreamUnavailable):
+            unavailable = task.exception()
+        elif task.exception() is not None:
+            logger.warning("Genius search failed: %s", task.exception())
+        else:
+            return task.result()
+        return None
+
+    try:
+        if clean_artist and clean_track:
+            # Give the (better) artist + track search a head start before spending a second request
+            done, pending = await asyncio.wait(pending, timeout=LYRICS_HEDGE_SECONDS)
+            for task in done:
+                if song_url(task):
+                    return task.result()
+            logger.debug("Trying track-only search: %s", clean_track)
+            pending.add(asyncio.ensure_future(_run_blocking(_io_pool, deadline, _search, clean_track, cancelled, clean_artist)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if song_url(task):
+                    return task.result()
+    finally:
+        cancelled.set()
+        for task in pending:
+            task.cancel()
+
+    # Only a definite "not found" may be cached; an unreachable Genius may not
+    if unavailable is not None:
+        raise unavailable
+    return None
+
+
+async def find_lyrics_async(clean_artist: str, clean_track: str, deadline=None):
+    """(song_url, lyrics_text) for a track; either may be None"""
+    song_url = await find_song_url(clean_artist, clean_track, deadline)
+    if not song_url:
+        return None, None
+
+    cancelled = threading.Event()
+    try:
+        html = await _run_blocking(_io_pool, deadline, _download, song_url, cancelled)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+    if html is None:
+        return song_url, None
+
+    loop = asyncio.get_running_loop()
+    lyrics_text = await loop.run_in_executor(_parse_pool, lyrics_api.extract_lyrics, html, song_url)
+    return song_url, lyrics_text
+
+
+def find_lyrics(clean_artist: str, clean_track: str):
+    """
+    Blocking entry point: search Genius and scrape the lyrics for a track.
+    Returns (song_url, lyrics_text); raises UpstreamUnavailable if Genius can't
+    be reached or the request budget runs out.
+    """
+    if LYRICS_PIPELINE == "sync":
+        song_url = lyrics_api.search_genius_song(clean_artist, clean_track)
+        return song_url, (lyrics_api.scrape_lyrics_from_genius(song_url) if song_url else None)
+
+    remaining = remaining_budget()
+    deadline = None if remaining is None else time.monotonic() + remaining
+    future = asyncio.run_coroutine_threadsafe(find_lyrics_async(clean_artist, clean_track, deadline), _get_loop())
+    try:
+        # Upstream timeouts end the pipeline well before this; it's only a backstop
+        return future.result(timeout=None if remaining is None else max(0, remaining) + 1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise UpstreamUnavailable("genius", "request latency budget exhausted")
@@ -0,0 +1,233 @@
+"""
+Minimal Prometheus-style metrics, exposed as text by the /metrics endpoint.
+
+Metrics are plain in-process counters, gauges and histograms guarded by a lock
+each, so recording one costs a dict lookup and an addition. No extra
+dependency is needed on the Pi; the output follows the Prometheus text format
+(version 0.0.4) so any Prometheus-compatible scraper can read it.
+"""
+import bisect
+import sqlite3
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond SQLite queries to slow syncs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_registry = []
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, plus a +Inf slot, sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self, labels)
+
+    def _render_value(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+# --- Metrics recorded by the app ---------------------------------------------
+
+HTTP_REQUEST_DURATION = Histogram(
+    "vinyl_http_request_duration_seconds", "Time spent handling inbound requests", ("route", "method", "status"))
+UPSTREAM_REQUESTS = Counter(
+    "vinyl_upstream_requests_total", "Outbound requests to Discogs/Genius by response status", ("upstream", "status"))
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "vinyl_upstream_request_duration_seconds", "Latency of outbound requests to Discogs/Genius", ("upstream",))
+CACHE_REQUESTS = Counter(
+    "vinyl_cache_requests_total", "Release and lyrics cache lookups", ("cache", "result"))
+SQLITE_QUERY_DURATION = Histogram(
+    "vinyl_sqlite_query_duration_seconds", "Time spent executing SQLite statements", ("statement",))
+SYNC_DURATION = Histogram(
+    "vinyl_sync_duration_seconds", "Duration of collection syncs with Discogs", ("result",))
+SHED_REQUESTS = Counter(
+    "vinyl_shed_requests_total", "Requests rejected with 503 because a concurrency limit was full", ("limit", "reason"))
+RELEASE_REFRESHES = Counter(
+    "vinyl_release_refreshes_total", "Background re-fetches of stale release details by result", ("result",))
+DISCOGS_RATELIMIT_REMAINING = Gauge(
+    "vinyl_discogs_ratelimit_remaining", "X-Discogs-Ratelimit-Remaining from the latest Discogs response")
+DISCOGS_RATELIMIT_LIMIT = Gauge(
+    "vinyl_discogs_ratelimit_limit", "X-Discogs-Ratelimit from the latest Discogs response")
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def render_metrics(extra_gauges=()):
+    """
+    The whole registry in Prometheus text format.
+
+    `extra_gauges` is an iterable of (name, help, {labels: value}) tuples computed
+    at scrape time (e.g. circuit breaker state).
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+
+    # Hit ratios are derived from the counters at scrape time
+    lines.append("# HELP vinyl_cache_hit_ratio Share of cache lookups that were hits since startup")
+    lines.append("# TYPE vinyl_cache_hit_ratio gauge")
+    for cache in ("release", "lyrics"):
+        hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+        misses = CACHE_REQUESTS.value(cache=cache, result="miss")
+        if hits + misses:
+            lines.append(f'vinyl_cache_hit_ratio{{cache="{cache}"}} {hits / (hits + misses)}')
+
+    for name, help_text, values in extra_gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in values.items():
+            lines.append(f"{name}{_format_labels([k for k, _ in labels], [v for _, v in labels])} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# --- SQLite instrumentation ----------------------------------------------------
+
+def _statement_kind(sql: str):
+    return sql.lstrip()[:6].upper().rstrip() or "OTHER"
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records how long each statement takes"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, statement=_statement_kind(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, statement=_statement_kind(sql))
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, statement="SCRIPT")
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (and connection.execute shortcuts) are timed"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(path: str):
+    """sqlite3.connect() with query timing"""
+    return sqlite3.connect(path, factory=TimedConnection)
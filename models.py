@@ -0,0 +1,119 @@
+"""
+Compact in-memory models for the collection.
+
+A Release is built once per sync from the Discogs (or cached) data and is what
+the app keeps in memory between requests. The classes use __slots__ and
+tuples, and the strings that repeat across a collection (genres, styles,
+labels, formats) are interned, so a large collection fits comfortably on a
+1 GB Pi.
+"""
+import sys
+
+
+def _intern_all(values):
+    return tuple(sys.intern(v) for v in values if isinstance(v, str) and v)
+
+
+class Release:
+    """A record in the collection, as shown on the page"""
+
+    __slots__ = (
+        "id",
+        "title",
+        "artist",
+        "year",
+        "thumb",
+        "cover_image",
+        "genres",
+        "styles",
+        "format",
+        "format_desc",
+        "labels",
+        "master_id",
+        "tracks",
+    )
+
+    def __init__(self, id, title="", artist="", year="Unknown", thumb="", cover_image="", genres=(), styles=(),
+                 format="Unknown", format_desc="", labels=(), master_id=None, tracks=()):
+        self.id = id
+        self.title = title
+        self.artist = artist
+        self.year = year
+        self.thumb = thumb
+        self.cover_image = cover_image
+        self.genres = genres  # Genres followed by styles (what the genre filter matches on)
+        self.styles = styles
+        self.format = format
+        self.format_desc = format_desc
+        self.labels = labels
+        self.master_id = master_id
+        self.tracks = tracks  # Track titles, in tracklist order
+
+    @classmethod
+    def from_api(cls, item: dict):
+        """
+        Build a Release from a collection item ({"basic_information": {...}, "tracks": [...]}),
+        either straight from Discogs or rebuilt from the database cache.
+        """
+        basic = item.get("basic_information", {})
+        genres = _intern_all(basic.get("genres", []) or [])
+        styles = _intern_all(basic.get("styles", []) or [])
+
+        # Get format information
+        format_name = "Unknown"
+        format_desc = ""
+        formats = basic.get("formats", [])
+        if isinstance(formats, list) and formats and isinstance(formats[0], dict):
+            format_name = formats[0].get("name", "Unknown") or "Unknown"
+            descriptions = formats[0].get("descriptions")
+            if isinstance(descriptions, list):
+                format_desc = ", ".join(d for d in descriptions if isinstance(d, str))
+
+        # Get labels
+        labels = basic.get("labels", [])
+        label_names = _intern_all(label.get("name", "") for label in labels if isinstance(label, dict)) if isinstance(labels, list) else ()
+
+        return cls(
+            id=basic.get("id"),
+            title=basic.get("title", ""),
+            artist=", ".join([artist["name"] for artist in basic.get("artists", [])]),
+            year=basic.get("year", "Unknown"),
+            thumb=basic.get("thumb", ""),
+            cover_image=basic.get("cover_image", ""),
+            genres=genres + styles,
+            styles=styles,
+            format=sys.intern(format_name),
+            format_desc=sys.intern(format_desc),
+            labels=label_names,
+            master_id=basic.get("master_id", None),
+            tracks=tuple(item.get("tracks", []) or ()),
+        )
+
+    def to_dict(self):
+        """The JSON-friendly record the page's script expects"""
+        return {
+            "title": self.title,
+            "artist": self.artist,
+            "year": self.year,
+            "thumb": self.thumb,
+            "cover_image": self.cover_image,
+            "id": self.id,
+            "tracks": list(self.tracks),
+            "genres": list(self.genres),
+            "format": self.format,
+            "format_desc": self.format_desc,
+            "labels": list(self.labels),
+            "styles": list(self.styles),
+            "master_id": self.master_id,
+        }
+
+    def __getstate__(self):
+        # Pickle as a plain tuple of slot values - keeps snapshots small and fast to load
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"Release({self.id!r}, {self.artist!r} - {self.title!r})"
@@ -0,0 +1,168 @@
+"""
+Opt-in profiling of individual requests and sync runs.
+
+Profiling is off unless enabled:
+- PROFILE_REQUESTS=<fraction> profiles that share of requests (1 = every request),
+- PROFILE_SYNC=true profiles every collection sync,
+- or an admin adds ?profile=1 to a request (needs ADMIN_TOKEN, passed as the
+  X-Admin-Token header; never in the URL, where access logs would keep it).
+
+Two engines (PROFILE_ENGINE):
+- "sample" (default): a background thread samples the profiled thread's stack
+  every PROFILE_INTERVAL_MS and writes collapsed stacks (*.folded), the input
+  format of flamegraph.pl / speedscope / inferno.
+- "cprofile": deterministic cProfile, written as a pstats dump (*.prof) for
+  snakeviz, flameprof or gprof2dot.
+
+Profiles go to PROFILE_DIR, which is kept as a ring of the most recent
+PROFILE_RING_SIZE files.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", 50))
+PROFILE_ENGINE = os.getenv("PROFILE_ENGINE", "sample")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_REQUESTS = float(os.getenv("PROFILE_REQUESTS", 0) or 0)
+PROFILE_SYNC = os.getenv("PROFILE_SYNC", "False").lower() == "true"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+logger = logging.getLogger(__name__)
+
+_ring_lock = threading.Lock()
+
+
+def is_admin(request):
+    """True if the request carries the configured ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+def should_profile_request(request):
+    if request.args.get("profile") == "1" and is_admin(request):
+        return True
+    return PROFILE_REQUESTS > 0 and random.random() < PROFILE_REQUESTS
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profile:
+    """One in-progress profile; call stop() to write it to the ring"""
+
+    def __init__(self, kind: str, label: str, engine: str = PROFILE_ENGINE):
+        self.kind = kind
+        self.label = label
+        self.engine = engine
+        self.started = time.time()
+        if engine == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+            self._profiler.start()
+
+    def stop(self):
+        """Stop profiling and save the result; returns the file name"""
+        duration_ms = int((time.time() - self.started) * 1000)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.label).strip("_")[:60] or "root"
+        extension = "prof" if self.engine == "cprofile" else "folded"
+        name = f"{int(self.started * 1000)}-{self.kind}-{slug}-{duration_ms}ms.{extension}"
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, name)
+        if self.engine == "cprofile":
+            self._profiler.disable()
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            self._profiler.dump(path)
+
+        _trim_ring()
+        return name
+
+
+def _trim_ring():
+    """Delete the oldest profiles beyond PROFILE_RING_SIZE"""
+    with _ring_lock:
+        profiles = sorted(list_profiles(), key=lambda p: p["name"])
+        for old in profiles[:max(0, len(profiles) - PROFILE_RING_SIZE)]:
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["name"]))
+            except OSError:
+                pass
+
+
+def list_profiles():
+    """Saved profiles, newest first"""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith((".folded", ".prof"))]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in sorted(names, reverse=True):
+        try:
+            size = os.path.getsize(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            continue
+        created_ms, kind = name.split("-", 2)[:2]
+        profiles.append({"name": name, "kind": kind, "created_at": int(created_ms) // 1000, "bytes": size})
+    return profiles
+
+
+@contextmanager
+def profile_sync(label: str = "collection"):
+    """Profile the enclosed block if PROFILE_SYNC is enabled"""
+    if not PROFILE_SYNC:
+        yield
+        return
+    profile = Profile("sync", label)
+    try:
+        yield
+    finally:
+        name = profile.stop()
+        logger.info("Saved sync profile %s", name)
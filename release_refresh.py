@@ -0,0 +1,140 @@
+"""
+Background refresh of cached release details.
+
+Releases are fetched once when they join the collection and were never looked
+at again, so Discogs corrections (tracklists, labels, genres) didn't arrive.
+This thread re-fetches releases older than RELEASE_MAX_AGE_DAYS one at a time:
+
+- Most urgent first: the record now playing, then records played at least
+  REFRESH_FREQUENT_PLAYS times, then the rest, oldest first within each group.
+  The next release is picked right before each fetch, so a record put on the
+  turntable jumps the queue.
+- Each fetch needs a background slot from DISCOGS_RATE, which caps refreshes
+  at REFRESH_RATE_SHARE of the Discogs request rate and pauses them while a
+  sync is fetching or Discogs reports its budget running low.
+- While the Discogs breaker is open the thread waits for it to close. A 429 or
+  5xx (or any other failed fetch) leaves the release stale and backs off for
+  Retry-After or REFRESH_BACKOFF_SECONDS; only releases gone from Discogs
+  (404/410) are marked fresh so they aren't asked for again right away.
+"""
+import logging
+import os
+import threading
+
+import requests
+
+import discogs_api
+from metrics import RELEASE_REFRESHES
+from resilience import DISCOGS_BREAKER, DISCOGS_RATE, UpstreamUnavailable
+
+# Cached release details older than this are re-fetched
+RELEASE_MAX_AGE_DAYS = float(os.getenv("RELEASE_MAX_AGE_DAYS", 30))
+# Records played at least this often are refreshed before unplayed/rarely played ones
+REFRESH_FREQUENT_PLAYS = int(os.getenv("REFRESH_FREQUENT_PLAYS", 3))
+# How long to sleep once nothing is stale
+REFRESH_IDLE_SECONDS = float(os.getenv("REFRESH_IDLE_SECONDS", 600))
+# How often to ask for a background slot while the rate limit holds refreshes back
+REFRESH_POLL_SECONDS = float(os.getenv("REFRESH_POLL_SECONDS", 1))
+# Pause after a failed fetch (429, 5xx, ...) when Discogs doesn't send Retry-After
+REFRESH_BACKOFF_SECONDS = float(os.getenv("REFRESH_BACKOFF_SECONDS", 60))
+
+# Statuses that mean the release is gone from Discogs, not that Discogs is struggling
+_GONE_STATUSES = (404, 410)
+
+logger = logging.getLogger(__name__)
+
+_stop = threading.Event()
+_thread = None
+
+
+def _stale_release_ids(limit: int = 1):
+    return discogs_api.get_stale_release_ids(RELEASE_MAX_AGE_DAYS * 86400, REFRESH_FREQUENT_PLAYS, limit)
+
+
+def refresh_next(token: str):
+    """
+    Refresh the most urgent stale release, if any. Returns its id, or None
+    when nothing is stale. The caller is responsible for the rate limit.
+    A failed fetch is re-raised and leaves the release stale, unless Discogs
+    says it's gone.
+    """
+    release_ids = _stale_release_ids()
+    if not release_ids:
+        return None
+    release_id = release_ids[0]
+    try:
+        discogs_api.refresh_release(release_id, token)
+    except UpstreamUnavailable:
+        RELEASE_REFRESHES.inc(result="unavailable")
+        raise
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code not in _GONE_STATUSES:
+            RELEASE_REFRESHES.inc(result="error")
+            raise
+        # Removed from Discogs - keep the cached copy and try again once it's stale again
+        logger.warning("Release %s is gone from Discogs: %s", release_id, e)
+        discogs_api.touch_release(release_id)
+        RELEASE_REFRESHES.inc(result="gone")
+    except Exception:
+        RELEASE_REFRESHES.inc(result="error")
+        raise
+    else:
+        logger.debug("Refreshed release details", extra={"release_id": release_id})
+        RELEASE_REFRESHES.inc(result="ok")
+    return release_id
+
+
+def _wait_for_slot():
+    """Block until a background Discogs slot is granted; False if stopping"""
+    while not _stop.is_set():
+        if DISCOGS_BREAKER.is_open:
+            _stop.wait(DISCOGS_BREAKER.probe_interval)
+        elif DISCOGS_RATE.try_acquire_background():
+            return True
+        else:
+            _stop.wait(REFRESH_POLL_SECONDS)
+    return False
+
+
+def _backoff_seconds(error: Exception):
+    """Retry-After from a failed Discogs response, else REFRESH_BACKOFF_SECONDS"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return REFRESH_BACKOFF_SECONDS
+
+
+def _run(token: str):
+    while not _stop.is_set():
+        try:
+            if not _stale_release_ids():
+                _stop.wait(REFRESH_IDLE_SECONDS)
+                continue
+            if not _wait_for_slot():
+                return
+            # Picked only now, so priorities reflect what happened while waiting
+            refresh_next(token)
+        except UpstreamUnavailable as e:
+            logger.info("Release refresh paused, Discogs unavailable: %s", e)
+        except requests.HTTPError as e:
+            delay = _backoff_seconds(e)
+            logger.info("Release refresh backing off for %.0f s: %s", delay, e)
+            _stop.wait(delay)
+        except Exception:
+            logger.exception("Release refresh failed")
+            _stop.wait(REFRESH_BACKOFF_SECONDS)
+
+
+def start_release_refresh(token: str):
+    """Start the refresh thread (once per process)"""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(token,), name="release-refresh", daemon=True)
+    _thread.start()
+
+
+def stop_release_refresh():
+    _stop.set()
@@ -0,0 +1,273 @@
+"""
+Circuit breakers and per-request latency budgets for the upstream services
+(Discogs and Genius).
+
+- Each upstream has a CircuitBreaker. After a few consecutive failures it
+  opens: calls fail fast with UpstreamUnavailable instead of waiting out
+  timeouts, and a background thread probes the upstream until it recovers.
+- An inbound request can set a total latency budget with request_budget().
+  Every outbound call made while handling it gets a timeout no larger than
+  what is left of the budget, so a slow upstream can't stack up timeouts.
+- Discogs requests are spaced out by a shared RateLimit. Interactive work
+  (syncs) always gets the next slot; background refreshes only get a fixed
+  share of the rate and stand aside while interactive work needs it.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from metrics import (
+    DISCOGS_RATELIMIT_LIMIT,
+    DISCOGS_RATELIMIT_REMAINING,
+    UPSTREAM_REQUEST_DURATION,
+    UPSTREAM_REQUESTS,
+)
+
+# Default total time an inbound request may spend waiting on upstreams
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", 8))
+# Pause between Discogs requests (Discogs allows 60 authenticated requests/minute)
+DISCOGS_REQUEST_DELAY = float(os.getenv("DISCOGS_REQUEST_DELAY", 0.6))
+# Share of the Discogs request rate that background refreshes may use
+REFRESH_RATE_SHARE = float(os.getenv("REFRESH_RATE_SHARE", 0.25))
+# Background refreshes stay paused this long after an interactive Discogs request...
+REFRESH_YIELD_SECONDS = float(os.getenv("REFRESH_YIELD_SECONDS", 10))
+# ...and while Discogs reports fewer than this many requests left in its window
+REFRESH_MIN_REMAINING = int(os.getenv("REFRESH_MIN_REMAINING", 15))
+
+logger = logging.getLogger(__name__)
+
+# Deadline (time.monotonic()) for the request being handled in this context, if any
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when an upstream can't be called (breaker open or budget exhausted)"""
+
+    def __init__(self, upstream: str, message: str):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream.
+
+    closed -> open after `failure_threshold` consecutive failures.
+    open   -> closed once the background probe succeeds.
+    """
+
+    def __init__(self, name: str, probe_url: str, failure_threshold: int = 3, probe_interval: float = 30):
+        self.name = name
+        self.probe_url = probe_url
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.opened_at = None  # Unix time the breaker tripped, None while closed
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    @property
+    def stale_since(self):
+        """Whole-second Unix time the upstream became unavailable, or None"""
+        opened_at = self.opened_at
+        return int(opened_at) if opened_at is not None else None
+
+    def check(self):
+        """Raise UpstreamUnavailable if calls to this upstream are currently blocked"""
+        if self.opened_at is not None:
+            raise UpstreamUnavailable(self.name, f"circuit open since {int(self.opened_at)}")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.failure_threshold or self.opened_at is not None:
+                return
+            self.opened_at = time.time()
+            logger.warning("Circuit breaker for %s opened after %d failures", self.name, self._failures)
+            self._probe_thread = threading.Thread(target=self._probe_until_recovered, name=f"{self.name}-probe", daemon=True)
+            self._probe_thread.start()
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self.opened_at = None
+
+    def _probe_until_recovered(self):
+        while self.opened_at is not None:
+            time.sleep(self.probe_interval)
+            try:
+                r = requests.get(self.probe_url, headers={"User-Agent": "VinylPi/1.0"}, timeout=5)
+                healthy = r.status_code < 500 and r.status_code != 429
+            except requests.exceptions.RequestException:
+                healthy = False
+            if healthy:
+                logger.info("Circuit breaker for %s closed, upstream recovered", self.name)
+                self.reset()
+
+
+class RateLimit:
+    """
+    Spaces out requests to one upstream across all threads.
+
+    Interactive callers use acquire(), which takes the next free slot and
+    sleeps until it comes up. Background work uses try_acquire_background(),
+    which never waits and only takes a slot when it is free right now, the
+    background share of the rate isn't used up, no interactive request has
+    needed the upstream for `yield_seconds`, and the upstream's own rate-limit
+    headers don't report it running low.
+    """
+
+    def __init__(self, interval: float, background_share: float = REFRESH_RATE_SHARE,
+                 yield_seconds: float = REFRESH_YIELD_SECONDS, min_remaining: int = REFRESH_MIN_REMAINING):
+        self.interval = max(0.0, interval)
+        self.background_interval = self.interval / background_share if background_share > 0 else float("inf")
+        self.yield_seconds = yield_seconds
+        self.min_remaining = min_remaining
+        self._next = 0.0  # monotonic time the next request may start
+        self._next_background = 0.0
+        self._last_interactive = None
+        self._remaining = None  # (requests left, monotonic time reported)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for the next slot (interactive work)"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+            self._last_interactive = start
+        if start > now:
+            time.sleep(start - now)
+
+    def try_acquire_background(self):
+        """Take a slot for background work if it is free and not needed elsewhere; never waits"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next or now < self._next_background:
+                return False
+            if self._last_interactive is not None and now - self._last_interactive < self.yield_seconds:
+                return False
+            # Discogs counts requests over a moving minute, so an old report says little
+            if self._remaining is not None and now - self._remaining[1] < 60 and self._remaining[0] < self.min_remaining:
+                return False
+            self._next = now + self.interval
+            self._next_background = now + self.background_interval
+            return True
+
+    def record_remaining(self, remaining: int):
+        """Note the upstream's own count of requests left (e.g. X-Discogs-Ratelimit-Remaining)"""
+        self._remaining = (remaining, time.monotonic())
+
+
+DISCOGS_BREAKER = CircuitBreaker("discogs", os.getenv("DISCOGS_API_BASE", "https://api.discogs.com"))
+GENIUS_BREAKER = CircuitBreaker("genius", os.getenv("GENIUS_BASE", "https://genius.com"))
+DISCOGS_RATE = RateLimit(DISCOGS_REQUEST_DELAY)
+
+
+@contextmanager
+def request_budget(seconds: float = REQUEST_BUDGET_SECONDS):
+    """Limit the total upstream time of everything called inside this block"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_request_budget(view):
+    """Decorator: run a Flask view inside a fresh request_budget()"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with request_budget():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def remaining_budget():
+    """Seconds left in the current request budget, or None if there is no budget"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_transient(response):
+    """5xx and 429: the upstream is struggling or throttling us, not answering"""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+def raise_for_transient(breaker: CircuitBreaker, response):
+    """
+    Raise UpstreamUnavailable for a 5xx/429 response, so callers don't mistake
+    it for a definite answer (e.g. cache it as "not found").
+    """
+    if is_transient(response):
+        raise UpstreamUnavailable(breaker.name, f"HTTP {response.status_code}")
+
+
+def upstream_get(breaker: CircuitBreaker, url: str, timeout: float = 10, **kwargs):
+    """
+    requests.get() guarded by a circuit breaker and the current request budget.
+
+    Connection errors, timeouts, 5xx and 429 responses count as failures. The
+    response is returned as-is otherwise; callers still call raise_for_status().
+    """
+    try:
+        breaker.check()
+    except UpstreamUnavailable:
+        UPSTREAM_REQUESTS.inc(upstream=breaker.name, status="circuit_open")
+        raise
+
+    remaining = remaining_budget()
+    budget_limited = remaining is not None and remaining < timeout
+    if remaining is not None:
+        if remaining <= 0:
+            UPSTREAM_REQUESTS.inc(upstream=breaker.name, status="budget_exhausted")
+            raise UpstreamUnavailable(breaker.name, "request latency budget exhausted")
+        timeout = min(timeout, remaining)
+
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=timeout, **kwargs)
+    except requests.exceptions.Timeout:
+        UPSTREAM_REQUESTS.inc(upstream=breaker.name, status="timeout")
+        if budget_limited:
+            # Our own budget ran out - not evidence that the upstream is down
+            raise UpstreamUnavailable(breaker.name, "request latency budget exhausted")
+        breaker.record_failure()
+        raise
+    except requests.exceptions.ConnectionError:
+        UPSTREAM_REQUESTS.inc(upstream=breaker.name, status="connection_error")
+        breaker.record_failure()
+        raise
+    finally:
+        UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - start, upstream=breaker.name)
+
+    UPSTREAM_REQUESTS.inc(upstream=breaker.name, status=response.status_code)
+    if "X-Discogs-Ratelimit-Remaining" in response.headers:
+        try:
+            DISCOGS_RATELIMIT_REMAINING.set(int(response.headers["X-Discogs-Ratelimit-Remaining"]))
+            DISCOGS_RATE.record_remaining(int(response.headers["X-Discogs-Ratelimit-Remaining"]))
+            DISCOGS_RATELIMIT_LIMIT.set(int(response.headers.get("X-Discogs-Ratelimit", 0)))
+        except ValueError:
+            pass
+
+    if is_transient(response):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
@@ -0,0 +1,63 @@
+"""
+Persisted snapshot of the collection view model.
+
+The sync path writes the final records (the same ones the page renders) to a
+pickle file per user so that after a reboot the app can serve each collection
+straight from disk, with no Discogs calls, while a fresh sync runs in the
+background.
+"""
+import logging
+import os
+import pickle
+import time
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "collection_snapshot.pkl")
+
+# Bump this whenever the shape of the view model changes so old snapshots are ignored
+SNAPSHOT_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_path(username: str, path: str = SNAPSHOT_PATH):
+    """Where a user's snapshot lives: collection_snapshot.pkl -> collection_snapshot.<username>.pkl"""
+    root, ext = os.path.splitext(path)
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in username)
+    return f"{root}.{safe_name}{ext}"
+
+
+def save_snapshot(collection: list, genres: list, path: str = SNAPSHOT_PATH):
+    """Write the view model to disk atomically (write temp file, then rename)"""
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": int(time.time()),
+        "collection": collection,
+        "genres": genres,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH):
+    """
+    Load a previously saved snapshot.
+
+    Returns the payload dict (collection, genres, created_at) or None if there is
+    no usable snapshot (missing, unreadable or from an older version).
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Could not read collection snapshot %s: %s", path, e)
+        return None
+
+    if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+        logger.info("Ignoring collection snapshot %s: unsupported version", path)
+        return None
+
+    return payload
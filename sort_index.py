@@ -0,0 +1,77 @@
+"""
+Pre-built sort orders for the collection.
+
+A SortIndex is built once per collection version (each sync or snapshot load)
+and holds the artist, year and play-count orderings as permutations of the
+records, so serving a sorted page is a slice instead of a full sort. Play-count
+changes move a single record within its order instead of re-sorting.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+# Discogs disambiguation suffixes like "Nirvana (2)"
+_DISAMBIGUATION = re.compile(r"\s*\(\d+\)")
+_LEADING_ARTICLE = re.compile(r"^(the|a|an)\s+")
+_LEADING_PUNCTUATION = re.compile(r"^[\W_]+")
+
+SORT_KEYS = ("artist", "year", "play_count")
+
+
+def collation_key(text: str):
+    """
+    Sort key for artist/title text: case-folded, accents removed, Discogs
+    disambiguation and leading articles ("The", "A", "An") ignored.
+    """
+    text = unicodedata.normalize("NFKD", _DISAMBIGUATION.sub("", text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold().strip()
+    text = _LEADING_ARTICLE.sub("", text)
+    return _LEADING_PUNCTUATION.sub("", text) or text
+
+
+class SortIndex:
+    """Sort permutations for one collection version"""
+
+    def __init__(self, releases: list, play_counts: dict):
+        self._lock = threading.Lock()
+        self.by_id = {release.id: release for release in releases}
+        self.play_counts = {release.id: play_counts.get(release.id, 0) for release in releases}
+        self.artist_keys = {release.id: collation_key(release.artist) for release in releases}
+
+        # Artist order doubles as the tie-breaker for the other orders
+        by_artist = sorted(releases, key=lambda r: (self.artist_keys[r.id], collation_key(r.title), r.id))
+        self._artist_rank = {release.id: rank for rank, release in enumerate(by_artist)}
+
+        self._orders = {
+            "artist": by_artist,
+            "year": sorted(by_artist, key=lambda r: r.year if isinstance(r.year, int) else 0),
+        }
+        # Highest play count first; kept as sorted keys so one record can be moved with bisect
+        self._play_keys = sorted(self._play_key(release.id) for release in releases)
+
+    def _play_key(self, release_id):
+        return (-self.play_counts.get(release_id, 0), self._artist_rank[release_id], release_id)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def ordered(self, sort_by: str = "artist", start: int = 0, stop: int = None):
+        """Records in `sort_by` order, sliced to [start:stop]"""
+        if sort_by == "play_count":
+            with self._lock:
+                keys = self._play_keys[start:stop]
+            return [self.by_id[key[2]] for key in keys]
+        return self._orders.get(sort_by, self._orders["artist"])[start:stop]
+
+    def set_play_count(self, release_id: int, play_count: int):
+        """Move one record to its new place in the play-count order"""
+        with self._lock:
+            if release_id not in self.by_id:
+                return
+            old_key = self._play_key(release_id)
+            index = bisect.bisect_left(self._play_keys, old_key)
+            if index < len(self._play_keys) and self._play_keys[index] == old_key:
+                del self._play_keys[index]
+            self.play_counts[release_id] = play_count
+            bisect.insort(self._play_keys, self._play_key(release_id))
@@ -0,0 +1,547 @@
+/* Collection data */
+let allRecords = [];
+// allRecords in the current sort order; filtering keeps this order
+let sortedRecords = [];
+let filteredRecords = [];
+let sortAscending = true;
+// Track the record that is currently spinning (for UI/LED mapping)
+let nowPlayingRecordId = null;
+// Whose collection this page shows; sent with every update
+const currentUser = document.body.dataset.user;
+
+// Wait this long after the last keystroke before filtering
+const SEARCH_DEBOUNCE_MS = 150;
+// Rows rendered above and below the viewport, so fast scrolling doesn't show gaps
+const OVERSCAN_ROWS = 4;
+// Built cards are reused while scrolling; past this many the cache starts over
+const MAX_CACHED_CARDS = 1000;
+
+const artistCollator = new Intl.Collator(undefined, { sensitivity: "base" });
+
+function switchUser(name) {
+    window.location.search = "?user=" + encodeURIComponent(name);
+}
+
+/*
+ * The grid is windowed: only the rows in (or near) the viewport are in the
+ * DOM, and padding on the grid stands in for the rows above and below. All
+ * cards are the same height (see .title in style.css), so one measured card
+ * gives the row height for the whole collection.
+ */
+const grid = { columns: 1, rowHeight: 0, first: -1, last: -1 };
+let cards = new Map();  // record id -> card element
+let frameRequested = false;
+
+function buildCard(record) {
+    const div = document.createElement("div");
+    div.className = "record-card";
+    div.onclick = () => openModal(record);
+
+    const img = document.createElement("img");
+    img.loading = "lazy";
+    img.decoding = "async";
+    img.alt = record.title;
+    if (record.thumb) {
+        img.src = record.thumb;
+    }
+
+    const info = document.createElement("div");
+    info.className = "info";
+    for (const [className, text] of [["title", record.title], ["artist", record.artist], ["year", record.year || "Unknown"]]) {
+        const line = document.createElement("div");
+        line.className = className;
+        line.textContent = text;
+        info.appendChild(line);
+    }
+
+    div.append(img, info);
+    return div;
+}
+
+function cardFor(record) {
+    let card = cards.get(record.id);
+    if (!card) {
+        if (cards.size >= MAX_CACHED_CARDS) {
+            cards = new Map();
+        }
+        card = buildCard(record);
+        cards.set(record.id, card);
+    }
+    card.classList.toggle("current-record", Boolean(nowPlayingRecordId && record.id === nowPlayingRecordId));
+    return card;
+}
+
+function measureGrid(list) {
+    const style = getComputedStyle(list);
+    grid.columns = style.gridTemplateColumns.split(" ").filter(Boolean).length || 1;
+    const probe = cardFor(filteredRecords[0]);
+    list.style.paddingTop = "";
+    list.style.paddingBottom = "";
+    list.replaceChildren(probe);
+    grid.rowHeight = probe.offsetHeight + (parseFloat(style.rowGap) || 0);
+}
+
+function renderWindow(force) {
+    const list = document.getElementById("record-list");
+
+    if (filteredRecords.length === 0) {
+        list.style.paddingTop = "";
+        list.style.paddingBottom = "";
+        list.innerHTML = '<div class="empty-state">No records found. Try a different search.</div>';
+        grid.first = grid.last = -1;
+        return;
+    }
+
+    if (!grid.rowHeight) {
+        measureGrid(list);
+        force = true;
+    }
+    const totalRows = Math.ceil(filteredRecords.length / grid.columns);
+    const listTop = list.getBoundingClientRect().top + window.scrollY;
+    const viewTop = window.scrollY - listTop;
+    const last = Math.max(0, Math.min(totalRows - 1, Math.ceil((viewTop + window.innerHeight) / grid.rowHeight) + OVERSCAN_ROWS));
+    const first = Math.min(last, Math.max(0, Math.floor(viewTop / grid.rowHeight) - OVERSCAN_ROWS));
+    if (!force && first === grid.first && last === grid.last) {
+        return;
+    }
+    grid.first = first;
+    grid.last = last;
+
+    const fragment = document.createDocumentFragment();
+    const end = Math.min(filteredRecords.length, (last + 1) * grid.columns);
+    for (let i = first * grid.columns; i < end; i++) {
+        fragment.appendChild(cardFor(filteredRecords[i]));
+    }
+    list.style.paddingTop = `${first * grid.rowHeight}px`;
+    list.style.paddingBottom = `${(totalRows - 1 - last) * grid.rowHeight}px`;
+    list.replaceChildren(fragment);
+}
+
+function render() {
+    renderWindow(true);
+}
+
+function scheduleRender() {
+    if (frameRequested) return;
+    frameRequested = true;
+    requestAnimationFrame(() => {
+        frameRequested = false;
+        renderWindow(false);
+    });
+}
+
+window.addEventListener("scroll", scheduleRender, { passive: true });
+window.addEventListener("resize", () => {
+    // Column count and card size depend on the width
+    grid.rowHeight = 0;
+    scheduleRender();
+});
+
+function applyFilters() {
+    const q = document.getElementById("searchBar").value.toLowerCase();
+    const selectedGenre = document.getElementById("genreFilter").value;
+
+    filteredRecords = sortedRecords.filter(r => {
+        // Apply search filter
+        const matchesSearch = !q ||
+            r.artistLower.includes(q) ||
+            r.titleLower.includes(q);
+
+        // Apply genre filter
+        const matchesGenre = !selectedGenre ||
+            (r.genres && r.genres.includes(selectedGenre));
+
+        return matchesSearch && matchesGenre;
+    });
+
+    render();
+}
+
+// New search/genre results start at the top of the grid, not where the old list was scrolled to
+function showFromTop() {
+    const list = document.getElementById("record-list");
+    const listTop = list.getBoundingClientRect().top + window.scrollY;
+    if (window.scrollY > listTop) {
+        window.scrollTo(0, listTop);
+    }
+}
+
+let searchTimer = null;
+
+function applySearch() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        showFromTop();
+        applyFilters();
+    }, SEARCH_DEBOUNCE_MS);
+}
+
+function applyGenreFilter() {
+    showFromTop();
+    applyFilters();
+}
+
+function applySort() {
+    const sortBy = document.getElementById("sortSelect").value;
+    const direction = sortAscending ? 1 : -1;
+
+    sortedRecords = [...allRecords];
+    if (sortBy === "artist") {
+        // sort_artist is the server's collation key ("The" ignored, case-folded)
+        sortedRecords.sort((a, b) => direction * artistCollator.compare(a.sort_artist || a.artist, b.sort_artist || b.artist));
+    } else if (sortBy === "year") {
+        sortedRecords.sort((a, b) => direction * ((a.year || 0) - (b.year || 0)));
+    } else if (sortBy === "play_count") {
+        sortedRecords.sort((a, b) => direction * ((a.play_count || 0) - (b.play_count || 0)));
+    }
+
+    applyFilters();
+}
+
+function toggleDirection() {
+    sortAscending = !sortAscending;
+    const btn = document.getElementById("sortDirection");
+    btn.textContent = sortAscending ? "↓" : "↑";
+    applySort();
+}
+
+function openRandomRecord() {
+    // Use filteredRecords if available, otherwise use allRecords
+    const recordsToChooseFrom = filteredRecords.length > 0 ? filteredRecords : allRecords;
+    
+    if (recordsToChooseFrom.length === 0) {
+        return; // No records available
+    }
+    
+    // Pick a random record
+    const randomIndex = Math.floor(Math.random() * recordsToChooseFrom.length);
+    const randomRecord = recordsToChooseFrom[randomIndex];
+    
+    // Open the modal for the random record
+    openModal(randomRecord);
+}
+
+let scrollPosition = 0;
+
+// Tracks which record is open in the modal for play count updates
+let currentRecordId = null;
+
+function openModal(record) {
+    const modal = document.getElementById("trackModal");
+    if (modal.classList.contains("show")) return;
+
+    // Store current record ID for play count updates
+    currentRecordId = record.id;
+
+    // Populate modal content first
+    const coverImage = record.cover_image || record.thumb || "";
+    const modalImageEl = document.getElementById("modalImage");
+    if (coverImage) {
+        modalImageEl.src = coverImage;
+        modalImageEl.alt = record.title;
+        const sanitizedCoverImage = coverImage.replace(/"/g, '\\"');
+        modal.style.setProperty("--modal-bg-image", `url("${sanitizedCoverImage}")`);
+        modal.classList.add("has-cover");
+    } else {
+        modalImageEl.removeAttribute("src");
+        modalImageEl.alt = "";
+        modal.style.removeProperty("--modal-bg-image");
+        modal.classList.remove("has-cover");
+    }
+    document.getElementById("modalTitle").textContent = record.title;
+    document.getElementById("modalArtist").textContent = record.artist;
+    
+    // Populate release information
+    const year = record.year || "Unknown";
+    document.getElementById("modalYear").textContent = `${year} / ${year}`;
+    document.getElementById("modalGenres").textContent = (record.genres && record.genres.length > 0) ? record.genres.join(", ") : "-";
+    document.getElementById("modalStyles").textContent = (record.styles && record.styles.length > 0) ? record.styles.join(", ") : "-";
+    document.getElementById("modalFormat").textContent = record.format || "-";
+    document.getElementById("modalFormatDesc").textContent = record.format_desc || "-";
+    document.getElementById("modalLabels").textContent = (record.labels && record.labels.length > 0) ? record.labels.join(", ") : "-";
+    const playCountValue = typeof record.play_count === "number" ? record.play_count : 0;
+    const playCountEl = document.getElementById("playCount");
+    if (playCountEl) {
+        playCountEl.textContent = playCountValue;
+    }
+    const undoBtn = document.getElementById("undoPlayBtn");
+    if (undoBtn) {
+        undoBtn.style.display = playCountValue > 0 ? "block" : "none";
+    }
+    
+    const trackList = document.getElementById("trackList");
+    trackList.innerHTML = "";
+    
+    if (record.tracks && record.tracks.length > 0) {
+        record.tracks.forEach((track, index) => {
+            const li = document.createElement("li");
+            // Format track number (A1, A2, B1, etc.)
+            // Split tracks roughly in half for A and B sides
+            const midPoint = Math.ceil(record.tracks.length / 2);
+            const side = index < midPoint ? "A" : "B";
+            const trackNum = index < midPoint ? index + 1 : index - midPoint + 1;
+            const trackLabel = `${side}${trackNum} - ${track}`;
+            
+            li.textContent = trackLabel;
+            li.style.cursor = "pointer";
+            li.onclick = (e) => {
+                e.stopPropagation();
+                openLyricsModal(record.artist, track);
+            };
+            trackList.appendChild(li);
+        });
+    } else {
+        trackList.innerHTML = "<li>No track information available</li>";
+    }
+    
+    // Lock body scroll before showing modal
+    scrollPosition = window.scrollY || window.pageYOffset;
+    document.body.classList.add("modal-open");
+    
+    // Show modal
+    modal.classList.add("show");
+}
+
+function incrementPlayCount() {
+    if (!currentRecordId) return;
+    
+    fetch("/api/play_count", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({
+            user: currentUser,
+            release_id: currentRecordId,
+            delta: 1
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        const playCountEl = document.getElementById("playCount");
+        playCountEl.textContent = data.play_count;
+        
+        // Show undo button
+        document.getElementById("undoPlayBtn").style.display = "block";
+        
+        // Update the record in allRecords array
+        const record = allRecords.find(r => r.id === currentRecordId);
+        if (record) {
+            record.play_count = data.play_count;
+        }
+
+        // Update now playing from server response
+        if (data.current_record_id) {
+            nowPlayingRecordId = data.current_record_id;
+            updateNowPlayingBanner();
+        } else {
+            // Re-render so current indicator updates
+            render();
+        }
+        
+        // Re-apply sorting if sorting by play count
+        const sortBy = document.getElementById("sortSelect").value;
+        if (sortBy === "play_count") {
+            applySort();
+        }
+    })
+    .catch(error => {
+        console.error("Error updating play count:", error);
+    });
+}
+
+function decrementPlayCount() {
+    if (!currentRecordId) return;
+    
+    fetch("/api/play_count", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({
+            user: currentUser,
+            release_id: currentRecordId,
+            delta: -1
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        const playCountEl = document.getElementById("playCount");
+        playCountEl.textContent = data.play_count;
+        
+        // Hide undo button if count is 0
+        const undoBtn = document.getElementById("undoPlayBtn");
+        undoBtn.style.display = (data.play_count > 0) ? "block" : "none";
+        
+        // Update the record in allRecords array
+        const record = allRecords.find(r => r.id === currentRecordId);
+        if (record) {
+            record.play_count = data.play_count;
+        }
+        
+        // Re-apply sorting if sorting by play count
+        const sortBy = document.getElementById("sortSelect").value;
+        if (sortBy === "play_count") {
+            applySort();
+        }
+        else {
+            render();
+        }
+    })
+    .catch(error => {
+        console.error("Error updating play count:", error);
+    });
+}
+
+function updateNowPlayingBanner() {
+    const banner = document.getElementById("nowPlaying");
+    const textEl = document.getElementById("nowPlayingText");
+    if (!banner || !textEl) return;
+
+    if (!nowPlayingRecordId) {
+        banner.classList.remove("visible");
+        textEl.textContent = "Nothing right now";
+        render();
+        return;
+    }
+
+    const record = allRecords.find(r => r.id === nowPlayingRecordId);
+    if (!record) {
+        banner.classList.remove("visible");
+        textEl.textContent = "Nothing right now";
+        render();
+        return;
+    }
+
+    textEl.textContent = `${record.artist} — ${record.title}`;
+    banner.classList.add("visible");
+    // Re-render so the current card is subtly highlighted
+    render();
+}
+
+function clearNowPlaying() {
+    fetch("/api/now_playing/clear", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json"
+        },
+        body: JSON.stringify({ user: currentUser })
+    })
+    .then(response => response.json())
+    .then(data => {
+        // We intentionally keep last_played for LEDs; here we just clear UI
+        nowPlayingRecordId = null;
+        updateNowPlayingBanner();
+    })
+    .catch(error => {
+        console.error("Error clearing now playing:", error);
+    });
+}
+
+function closeModal() {
+    const modal = document.getElementById("trackModal");
+    modal.classList.remove("show");
+    modal.style.removeProperty("--modal-bg-image");
+    modal.classList.remove("has-cover");
+    
+    // Restore body scroll
+    document.body.classList.remove("modal-open");
+    window.scrollTo(0, scrollPosition);
+    scrollPosition = 0;
+}
+
+document.getElementById("trackModal").addEventListener("click", (e) => {
+    if (e.target === e.currentTarget) {
+        closeModal();
+    }
+});
+
+function openLyricsModal(artist, trackName) {
+    const modal = document.getElementById("lyricsModal");
+    if (modal.classList.contains("show")) return;
+
+    // Set track info
+    document.getElementById("lyricsTrackTitle").textContent = trackName;
+    document.getElementById("lyricsArtist").textContent = artist;
+    
+    // Show loading state
+    const lyricsContent = document.getElementById("lyricsContent");
+    lyricsContent.innerHTML = '<div class="loading-spinner">Loading lyrics...</div>';
+    
+    // Lock body scroll
+    scrollPosition = window.scrollY || window.pageYOffset;
+    document.body.classList.add("modal-open");
+    
+    // Show modal
+    modal.classList.add("show");
+    
+    // Fetch lyrics
+    fetch(`/api/lyrics?artist=${encodeURIComponent(artist)}&track=${encodeURIComponent(trackName)}`)
+        .then(response => {
+            if (!response.ok) {
+                if (response.status === 404) {
+                    throw new Error("Lyrics not found");
+                }
+                if (response.status === 503) {
+                    throw new Error("Lyrics are temporarily unavailable. Please try again in a minute.");
+                }
+                throw new Error("Failed to fetch lyrics");
+            }
+            return response.json();
+        })
+        .then(data => {
+            lyricsContent.innerHTML = `<div class="lyrics-text">${data.lyrics.replace(/\n/g, '<br>')}</div>`;
+        })
+        .catch(error => {
+            console.error("Error fetching lyrics:", error);
+            lyricsContent.innerHTML = `<div class="lyrics-error">${error.message || "Unable to load lyrics. Please try again later."}</div>`;
+        });
+}
+
+function closeLyricsModal(event) {
+    if (event && event.target && event.target !== event.currentTarget) {
+        return;
+    }
+    const modal = document.getElementById("lyricsModal");
+    modal.classList.remove("show");
+    
+    // Restore body scroll
+    document.body.classList.remove("modal-open");
+    window.scrollTo(0, scrollPosition);
+    scrollPosition = 0;
+}
+
+document.getElementById("lyricsModal").addEventListener("click", (e) => {
+    if (e.target === e.currentTarget) {
+        closeLyricsModal();
+    }
+});
+
+// Loaded with defer, so the page (and the collection data) is parsed by now
+try {
+    const collectionDataElement = document.getElementById("collection-data");
+    const collectionDataJson = collectionDataElement ? collectionDataElement.textContent : "[]";
+    allRecords = JSON.parse(collectionDataJson);
+    console.log(`Loaded ${allRecords.length} records`);
+
+    // Lower-cased once here rather than on every search
+    for (const record of allRecords) {
+        record.artistLower = record.artist.toLowerCase();
+        record.titleLower = record.title.toLowerCase();
+    }
+    // Already in the server's order
+    sortedRecords = [...allRecords];
+    filteredRecords = sortedRecords;
+
+    // Initialize now playing from server-provided flag
+    const current = allRecords.find(r => r.is_current);
+    if (current) {
+        nowPlayingRecordId = current.id;
+    }
+} catch (error) {
+    console.error('Error parsing collection data:', error);
+    allRecords = [];
+    sortedRecords = [];
+    filteredRecords = [];
+}
+updateNowPlayingBanner();
@@ -0,0 +1,79 @@
+"""
+Content-hashed URLs for the files in static/, with no build step.
+
+Templates link assets through asset_url("style.css"), which returns
+/assets/style.<hash>.css where <hash> is taken from the file's contents. A
+changed file gets a new URL, so browsers may cache every URL for good
+(Cache-Control: immutable) and never revalidate. Hashes are computed on first
+use and again whenever a file's mtime or size changes, so editing static/ on
+the Pi takes effect without restarting or rebuilding anything.
+
+/static/<name> keeps working (with Flask's default short caching) for links
+that don't go through asset_url().
+"""
+import hashlib
+import os
+
+from flask import abort, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+# How long browsers may keep a fingerprinted asset
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", 365 * 86400))
+_HASH_LENGTH = 10
+
+_hashes = {}  # name -> ((mtime_ns, size), hash)
+
+
+def content_hash(static_dir: str, name: str):
+    """Short hash of a static file's contents, or None if it doesn't exist"""
+    path = safe_join(static_dir, name)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:_HASH_LENGTH]
+    _hashes[name] = (version, digest)
+    return digest
+
+
+def asset_url(name: str):
+    """URL of a static file that changes whenever its contents do"""
+    digest = content_hash(current_app.static_folder, name)
+    if digest is None:
+        # Missing file: fall back to the plain URL rather than failing the page
+        return f"{current_app.static_url_path}/{name}"
+    root, ext = os.path.splitext(name)
+    return f"/assets/{root}.{digest}{ext}"
+
+
+def serve_asset(filename: str):
+    """GET /assets/<root>.<hash><ext>"""
+    root, ext = os.path.splitext(filename)
+    name_root, _, digest = root.rpartition(".")
+    if not name_root or not digest:
+        abort(404)
+    name = name_root + ext
+    current = content_hash(current_app.static_folder, name)
+    if current is None:
+        abort(404)
+    response = send_from_directory(current_app.static_folder, name)
+    if digest == current:
+        response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    else:
+        # A page rendered before the file changed: serve the new contents, but
+        # don't let them be cached under the old hash
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def init_assets(app):
+    """Register asset_url() for templates and the /assets/ route"""
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
@@ -0,0 +1,32 @@
+"""
+Household members whose collections this Pi serves.
+
+DISCOGS_USERS lists them as comma-separated username:token pairs:
+
+    DISCOGS_USERS=alice:TOKEN_A,bob:TOKEN_B
+
+Without it, the single DISCOGS_USERNAME / DISCOGS_TOKEN pair is used. The first
+user is the default one: requests that don't pick a user get their collection,
+and data from single-user databases is migrated to them.
+"""
+import os
+
+from dotenv import load_dotenv
+
+
+def load_users():
+    """{username: token} in configured order (empty if nothing is configured)"""
+    load_dotenv()
+    users = {}
+    for entry in os.getenv("DISCOGS_USERS", "").split(","):
+        username, _, token = entry.strip().partition(":")
+        if username.strip() and token.strip():
+            users[username.strip()] = token.strip()
+    if not users and os.getenv("DISCOGS_USERNAME") and os.getenv("DISCOGS_TOKEN"):
+        users[os.getenv("DISCOGS_USERNAME")] = os.getenv("DISCOGS_TOKEN")
+    return users
+
+
+def default_username():
+    """The first configured user, or None"""
+    return next(iter(load_users()), None)